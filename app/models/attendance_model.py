@@ -12,9 +12,20 @@ class AttendanceRecord(db.Model):
     Supports time-in and time-out functionality for complete attendance tracking
     """
     __tablename__ = 'attendance_records'
+    __table_args__ = (
+        # Per-session record lookups; not unique because the legacy scan flow allows re-entry
+        db.Index('ix_attendance_student_session', 'student_id', 'session_id'),
+        # One record per student per scheduled session (target of ON CONFLICT time-ins)
+        db.Index(
+            'ix_attendance_student_schedule', 'student_id', 'schedule_session_id', unique=True,
+            postgresql_where=db.text('schedule_session_id IS NOT NULL'),
+            sqlite_where=db.text('schedule_session_id IS NOT NULL')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False, index=True)
+    # Indexed through the composite indexes above (student_id is their leading column)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False, index=True)
     session_id = db.Column(db.Integer, db.ForeignKey('attendance_sessions.id'), nullable=True, index=True)
     
@@ -243,9 +254,14 @@ class AttendanceSession(db.Model):
     Groups attendance records by session for better organization
     """
     __tablename__ = 'attendance_sessions'
+    __table_args__ = (
+        # Room scheduling overlap checks (room_id, is_active, start < :end, end > :start)
+        db.Index('ix_attendance_sessions_room_schedule', 'room_id', 'is_active', 'start_time', 'end_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False, index=True)
+    # Indexed through the composite index above (room_id is its leading column)
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
     session_name = db.Column(db.String(100), nullable=False)
     subject = db.Column(db.String(100))
     instructor = db.Column(db.String(100))
@@ -16,6 +16,17 @@ class Student(db.Model):
     Each student has a unique QR code for attendance tracking
     """
     __tablename__ = 'students'
+    __table_args__ = (
+        # Prefix LIKE support for similar student number lookups; PostgreSQL only uses
+        # a btree for LIKE 'x%' with pattern ops (SQLite can use the plain unique index)
+        db.Index(
+            'ix_students_student_no_pattern', 'student_no',
+            postgresql_ops={'student_no': 'varchar_pattern_ops'}
+        ).ddl_if(dialect='postgresql'),
+        # Expression indexes for the case-insensitive lookups (lower(col) = lower(:value))
+        db.Index('ix_students_student_no_lower', db.text('lower(student_no)')),
+        db.Index('ix_students_email_lower', db.text('lower(email)')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     student_no = db.Column(db.String(20), unique=True, nullable=False, index=True)
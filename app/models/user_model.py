@@ -5,9 +5,9 @@ Supports: Admin, Student, Professor roles
 """
 
 from app import db
+from app.utils.auth_utils import verify_password
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import check_password_hash
 
 class User(UserMixin, db.Model):
     """
@@ -44,7 +44,7 @@ class User(UserMixin, db.Model):
     
     def check_password(self, password):
         """Check if provided password matches stored hash"""
-        return check_password_hash(self.password, password)
+        return verify_password(self.password, password)
     
     def update_last_login(self):
         """Update last login timestamp"""
@@ -10,7 +10,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 from app import db
 from app.models.user_model import User
-from app.utils.auth_utils import hash_password, validate_email, validate_username, validate_password
+from app.utils.auth_utils import hash_password, verify_password, validate_email, validate_username, validate_password
 from app.forms.auth_forms import LoginForm, RegisterForm, ForgotPasswordForm, ChangePasswordForm, EditProfileForm
 
 auth_bp = Blueprint('auth', __name__)
@@ -32,7 +32,10 @@ def login():
             # Find user by username or email
             user = User.get_by_username(username) or User.get_by_email(username)
             
-            if user and user.is_active and user.check_password(password):
+            # Verify even when the user is missing so both cases take equally long
+            password_ok = verify_password(user.password if user else None, password)
+            
+            if user and user.is_active and password_ok:
                 # Update last login
                 user.update_last_login()
                 
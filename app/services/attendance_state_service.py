@@ -11,8 +11,10 @@ This service implements all the edge cases from QR_ATTENDANCE_EDGE_CASES.md:
 from app import db
 from app.models.attendance_model import AttendanceRecord, AttendanceSession
 from app.models.attendance_event_model import AttendanceEvent
+from app.models.session_schedule_model import SessionSchedule
 from app.models.student_model import Student
 from app.models.room_model import Room
+from app.services.new_attendance_service import NewAttendanceService
 from datetime import datetime, timedelta, timezone
 from sqlalchemy import and_, or_, func
 import logging
@@ -41,10 +43,6 @@ class AttendanceStateService:
         4. Grace period of 15 minutes before/after session
         """
         try:
-            # Import and use the new service
-            from app.services.new_attendance_service import NewAttendanceService
-            from app.models.session_schedule_model import SessionSchedule
-            
             new_service = NewAttendanceService()
             
             # Check if this is a SessionSchedule (new model) or AttendanceSession (legacy)
@@ -64,7 +62,8 @@ class AttendanceStateService:
                     room_id=room_id,
                     session_id=session_id,
                     scanned_by=scanned_by,
-                    scan_type=scan_type
+                    scan_type=scan_type,
+                    session_kind='attendance'
                 )
             
             return result
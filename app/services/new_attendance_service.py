@@ -2,12 +2,173 @@
 New Attendance Logic Service - Implements the user's requirements
 """
 from datetime import datetime, timedelta
-from app.models import AttendanceRecord, AttendanceSession, Student, Room
+from collections import namedtuple
+from app.models import AttendanceRecord, AttendanceSession, SessionSchedule, Student
 from app import db
+from sqlalchemy import and_, event, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Dialect-specific INSERT constructs that support ON CONFLICT DO NOTHING
+_CONFLICT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# AttendanceRecord session links backed by a unique (student_id, <link>) index.
+# session_id is not: the legacy AttendanceStateService flow allows re-entry.
+# init_db.py creates the index on databases that predate it.
+_UNIQUE_LINK_COLUMNS = frozenset({'schedule_session_id'})
+
+# Marks that _process_scan_impl has to load the attendance record itself
+_RECORD_NOT_LOADED = object()
+
+# The scan flow only reads these AttendanceRecord columns, so it selects them
+# directly instead of hydrating full ORM instances
+_RECORD_TIME_COLUMNS = (AttendanceRecord.id, AttendanceRecord.time_in, AttendanceRecord.time_out)
+_RecordTimes = namedtuple('_RecordTimes', ['id', 'time_in', 'time_out'])
+
+def _scan_clock():
+    """
+    Current time for every scan comparison and timestamp in this service.
+    Session models store naive local wall-clock times (SessionSchedule date +
+    time, AttendanceSession start/end), so scans use the same clock rather
+    than mixing in datetime.utcnow().
+    """
+    return datetime.now()
+
+
+# Fixed failure responses; handed out as copies so callers may still add keys
+_STUDENT_NOT_FOUND = {'success': False, 'message': 'Student not found', 'action': 'error'}
+_SESSION_NOT_FOUND = {'success': False, 'message': 'Session not found', 'action': 'error'}
+_SESSION_ENDED = {'success': False, 'message': 'Cannot time in - session has ended', 'action': 'error'}
+
+
+def _format_clock_time(value):
+    """Format a datetime as 12-hour 'HH:MM AM/PM' (same output as strftime('%I:%M %p'))"""
+    hour = value.hour
+    return f"{hour % 12 or 12:02d}:{value.minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+# Time-in opens this long before a session; time-out closes this long after it
+GRACE_PERIOD = timedelta(minutes=15)
+
+# Session timing metadata, keyed by (model name, id). Values are
+# (expires_at, (session_start, session_end, time_in_grace_start,
+#  time_out_grace_start, time_out_grace_end, is_active, qr_code_active)).
+SESSION_TIMING_CACHE_TTL = 60  # seconds
+SESSION_TIMING_CACHE_SIZE = 1024
+_session_timing_cache = {}
+
+
+# Per-model extractors returning (session_start, session_end, is_active, qr_code_active)
+_TIMING_EXTRACTORS = {
+    SessionSchedule: lambda s: (s.get_session_datetime(), s.get_session_end_datetime(), True, s.qr_code_active),
+    AttendanceSession: lambda s: (s.start_time, s.end_time, s.is_active, True),
+}
+
+
+def _read_session_timing(session):
+    """Extract start/end, the grace-period bounds and the active flags from a session model"""
+    extractor = _TIMING_EXTRACTORS.get(type(session))
+    if extractor is None:
+        return None
+    
+    session_start, session_end, is_active, qr_code_active = extractor(session)
+    return (
+        session_start,
+        session_end,
+        session_start - GRACE_PERIOD,  # time-in grace start (15 mins BEFORE session)
+        session_end,  # time-out grace start (right after session ends)
+        session_end + GRACE_PERIOD,  # time-out grace end (15 mins AFTER session)
+        is_active,
+        qr_code_active
+    )
+
+
+def _get_session_timing(session):
+    """Return cached session timing metadata, reading it from the model on a miss"""
+    key = (type(session).__name__, session.id)
+    now = time.monotonic()
+    
+    entry = _session_timing_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    timing = _read_session_timing(session)
+    if timing is None:
+        return None
+    
+    if len(_session_timing_cache) >= SESSION_TIMING_CACHE_SIZE:
+        # Drop expired entries first, then the oldest if still full
+        for stale_key in [k for k, (expires_at, _) in _session_timing_cache.items() if expires_at <= now]:
+            del _session_timing_cache[stale_key]
+        if len(_session_timing_cache) >= SESSION_TIMING_CACHE_SIZE:
+            del _session_timing_cache[next(iter(_session_timing_cache))]
+    
+    _session_timing_cache[key] = (now + SESSION_TIMING_CACHE_TTL, timing)
+    return timing
+
+
+def invalidate_session_timing(session):
+    """Forget cached timing for a session (called whenever the row changes)"""
+    _session_timing_cache.pop((type(session).__name__, session.id), None)
+
+
+def _invalidate_session_timing_listener(mapper, connection, target):
+    invalidate_session_timing(target)
+
+
+for _session_model in (AttendanceSession, SessionSchedule):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_session_model, _event_name, _invalidate_session_timing_listener)
+
+
+# Student full names, keyed by id. Values are (expires_at, name). Only found
+# students are cached, and entries expire so renames and deletes made by other
+# worker processes are picked up.
+STUDENT_NAME_CACHE_TTL = 60  # seconds
+STUDENT_NAME_CACHE_SIZE = 4096
+_student_name_cache = {}
+
+
+def _student_full_name(student_id):
+    """Return a student's full name (loading only the name columns), or None if not found"""
+    now = time.monotonic()
+    
+    entry = _student_name_cache.get(student_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    row = db.session.execute(
+        select(Student.first_name, Student.last_name).where(Student.id == student_id)
+    ).first()
+    if row is None:
+        _student_name_cache.pop(student_id, None)
+        return None
+    
+    if len(_student_name_cache) >= STUDENT_NAME_CACHE_SIZE:
+        # Drop expired entries first, then the oldest if still full
+        for stale_id in [k for k, (expires_at, _) in _student_name_cache.items() if expires_at <= now]:
+            del _student_name_cache[stale_id]
+        if len(_student_name_cache) >= STUDENT_NAME_CACHE_SIZE:
+            del _student_name_cache[next(iter(_student_name_cache))]
+    
+    name = f"{row.first_name} {row.last_name}"
+    _student_name_cache[student_id] = (now + STUDENT_NAME_CACHE_TTL, name)
+    return name
+
+
+def _clear_student_name_cache(mapper, connection, target):
+    _student_name_cache.pop(target.id, None)
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Student, _event_name, _clear_student_name_cache)
+
 class NewAttendanceService:
     """
     Implements the new attendance logic:
@@ -26,174 +187,12 @@ class NewAttendanceService:
         3. Time out: Only during 15 min grace AFTER session ends
         """
         try:
-            # Get entities
-            student = Student.query.get(student_id)
-            room = Room.query.get(session_schedule.room_id)
-            
-            if not student:
-                return {'success': False, 'message': 'Student not found', 'action': 'error'}
-            if not room:
-                return {'success': False, 'message': 'Room not found', 'action': 'error'}
-            
-            # Validate session timing
-            timing_result = self._validate_session_timing(session_schedule)
-            if not timing_result['valid']:
-                return {
-                    'success': False,
-                    'message': timing_result['error'],
-                    'action': 'error'
-                }
-            
-            # Get current attendance record for THIS SPECIFIC SESSION ONLY (session isolation)
-            current_record = AttendanceRecord.query.filter_by(
-                student_id=student_id,
-                schedule_session_id=session_schedule.id  # Only THIS session
-            ).first()
-            
-            current_time = timing_result['current_time']
-            session_start = timing_result['session_start']
-            session_end = timing_result['session_end']
-            
-            # DEBUG: Write timing info to file
-            import sys
-            sys.stdout.flush()
-            with open('debug_attendance_timing.txt', 'w') as f:
-                f.write(f"=== SESSIONSCHEDULE TIMING DEBUG ===\n")
-                f.write(f"Current time: {current_time} (type: {type(current_time)})\n")
-                f.write(f"Session start: {session_start} (type: {type(session_start)})\n")
-                f.write(f"Session end: {session_end} (type: {type(session_end)})\n")
-                if hasattr(session_start, 'tzinfo'):
-                    f.write(f"Session start tzinfo: {session_start.tzinfo}\n")
-                if hasattr(current_time, 'tzinfo'):
-                    f.write(f"Current time tzinfo: {current_time.tzinfo}\n")
-                f.write(f"===================\n")
-            
-            # Calculate grace periods
-            time_in_grace_start = session_start - timedelta(minutes=15)  # 15 mins BEFORE session
-            time_out_grace_start = session_end  # Right after session ends
-            time_out_grace_end = session_end + timedelta(minutes=15)  # 15 mins AFTER session
-            
-            # Check if in grace periods
-            in_time_in_grace = time_in_grace_start <= current_time < session_start
-            in_time_out_grace = time_out_grace_start <= current_time <= time_out_grace_end
-            
-            # FIRST TAP - TIME IN
-            if current_record is None:
-                # Check if we can time in
-                if current_time < time_in_grace_start:
-                    # Too early - before grace period
-                    time_diff = time_in_grace_start - current_time
-                    hours = int(time_diff.total_seconds() // 3600)
-                    minutes = int((time_diff.total_seconds() % 3600) // 60)
-                    return {
-                        'success': False,
-                        'message': f'Too early to time in. Time-in opens in {hours}h {minutes}m (15 minutes before session).',
-                        'action': 'error'
-                    }
-                elif current_time <= session_end:
-                    # Can time in (grace period or active session)
-                    # LATE if arrived AFTER session started (not during grace period)
-                    is_late = current_time >= session_start  # Late if arrived after session start
-                    
-                    # Create attendance record (constructor doesn't accept time_in)
-                    new_record = AttendanceRecord(
-                        student_id=student_id,
-                        room_id=session_schedule.room_id,  # Get room from session_schedule
-                        session_id=None,  # Not an AttendanceSession
-                        scanned_by=scanned_by,
-                        is_late=is_late
-                    )
-                    
-                    # Set SessionSchedule reference
-                    new_record.schedule_session_id = session_schedule.id
-                    
-                    # Update time_in to current_time (not UTC)
-                    new_record.time_in = current_time
-                    new_record.scan_time = current_time
-                    
-                    db.session.add(new_record)
-                    db.session.commit()
-                    
-                    # Update success message based on timing
-                    if in_time_in_grace:
-                        status_msg = " (GRACE PERIOD - ON TIME)"
-                    elif is_late:
-                        status_msg = " (MARKED AS LATE)"
-                    else:
-                        status_msg = ""
-                    
-                    return {
-                        'success': True,
-                        'message': f'Time in successful{status_msg}! Welcome {student.get_full_name()}',
-                        'action': 'time_in',
-                        'is_late': is_late,
-                        'in_grace_period': in_time_in_grace,
-                        'time_in': current_time.isoformat()
-                    }
-                else:
-                    # Session already ended
-                    return {
-                        'success': False,
-                        'message': 'Cannot time in - session has ended',
-                        'action': 'error'
-                    }
-            
-            # SECOND TAP - ALREADY TIMED IN
-            elif current_record.time_in and not current_record.time_out:
-                # Check if in time-out grace period
-                if in_time_out_grace:
-                    # TIME OUT - Grace period active
-                    current_record.time_out = current_time
-                    db.session.commit()
-                    
-                    return {
-                        'success': True,
-                        'message': f'Time out successful! (GRACE PERIOD) Thank you {student.get_full_name()}',
-                        'action': 'time_out',
-                        'in_grace_period': True,
-                        'time_in': current_record.time_in.isoformat(),
-                        'time_out': current_time.isoformat()
-                    }
-                else:
-                    # NOT in grace period - just show notification
-                    time_in_str = current_record.time_in.strftime("%I:%M %p")
-                    
-                    if current_time < session_end:
-                        # Session still active
-                        minutes_until_end = int((session_end - current_time).total_seconds() / 60)
-                        return {
-                            'success': False,
-                            'message': f'You are already timed in since {time_in_str}. Time-out will be available in {minutes_until_end} minutes (15-min grace period after session ends).',
-                            'action': 'already_timed_in',
-                            'time_in': current_record.time_in.isoformat()
-                        }
-                    else:
-                        # Grace period expired
-                        return {
-                            'success': False,
-                            'message': f'You were timed in at {time_in_str}, but the 15-minute grace period for time-out has expired.',
-                            'action': 'grace_expired',
-                            'time_in': current_record.time_in.isoformat()
-                        }
-            
-            # ALREADY COMPLETED
-            else:
-                return {
-                    'success': False,
-                    'message': f'You have already completed attendance for this session. Timed in at {current_record.time_in.strftime("%I:%M %p")} and timed out at {current_record.time_out.strftime("%I:%M %p")}.',
-                    'action': 'complete'
-                }
-            
+            return self._process_scan_impl(
+                student_id, session_schedule, 'schedule_session_id',
+                session_schedule.room_id, scanned_by
+            )
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            logger.error(f"Error in process_session_schedule_attendance: {str(e)}\n{error_details}")
-            
-            # Write error to file for debugging
-            with open('debug_error_schedule.txt', 'w') as f:
-                f.write(f"Error in process_session_schedule_attendance:\n")
-                f.write(f"Error message: {str(e)}\n")
-                f.write(f"Full traceback:\n{error_details}\n")
+            logger.exception("Error in process_session_schedule_attendance")
             
             return {
                 'success': False,
@@ -201,216 +200,265 @@ class NewAttendanceService:
                 'action': 'error'
             }
 
-    def process_attendance_scan(self, student_id, room_id, session_id, scanned_by, scan_type='auto'):
+    def process_attendance_scan(self, student_id, room_id, session_id, scanned_by, scan_type='auto',
+                                session_kind='attendance'):
         """
         Process attendance for AttendanceSession with grace period logic:
         1. First tap: Time in (15 min grace BEFORE session = late indicator)
         2. Second tap: Show "already timed in" notification  
         3. Time out: Only during 15 min grace AFTER session ends
+        
+        session_kind is 'attendance' (AttendanceSession) or 'schedule'
+        (SessionSchedule); callers already know which table session_id
+        belongs to, so only that table is queried.
         """
         try:
-            # Get entities
-            student = Student.query.get(student_id)
-            room = Room.query.get(room_id)
-            
-            # Try to get session
-            session = AttendanceSession.query.get(session_id)
-            if not session:
-                from app.models.session_schedule_model import SessionSchedule
-                session = SessionSchedule.query.get(session_id)
-            
-            if not student:
-                return {'success': False, 'message': 'Student not found', 'action': 'error'}
-            if not room:
-                return {'success': False, 'message': 'Room not found', 'action': 'error'}
-            if not session:
-                return {'success': False, 'message': 'Session not found', 'action': 'error'}
-            
-            # Validate session timing
-            timing_result = self._validate_session_timing(session)
-            if not timing_result['valid']:
+            if session_kind == 'schedule':
+                session_model, link_attr = SessionSchedule, 'schedule_session_id'
+            else:
+                session_model, link_attr = AttendanceSession, 'session_id'
+            
+            # Load the session and this student's record for it in one round-trip
+            link_column = getattr(AttendanceRecord, link_attr)
+            row = db.session.query(session_model, *_RECORD_TIME_COLUMNS).outerjoin(
+                AttendanceRecord,
+                and_(link_column == session_model.id, AttendanceRecord.student_id == student_id)
+            ).filter(session_model.id == session_id).first()
+            
+            if row is None:
+                if _student_full_name(student_id) is None:
+                    return _STUDENT_NOT_FOUND.copy()
+                return _SESSION_NOT_FOUND.copy()
+            
+            session, record_id, time_in, time_out = row
+            current_record = None if record_id is None else _RecordTimes(record_id, time_in, time_out)
+            return self._process_scan_impl(
+                student_id, session, link_attr, room_id, scanned_by, current_record
+            )
+        
+        except Exception:
+            logger.exception("Error processing attendance scan")
+            
+            return {
+                'success': False,
+                'message': 'System error occurred while processing attendance',
+                'action': 'error'
+            }
+    
+    def _process_scan_impl(self, student_id, session, link_attr, room_id, scanned_by,
+                           current_record=_RECORD_NOT_LOADED):
+        """
+        Shared time-in/time-out flow for both session models.
+        link_attr is the AttendanceRecord column that points at the session:
+        'schedule_session_id' for SessionSchedule, 'session_id' for AttendanceSession.
+        current_record may be passed in when the caller already loaded it as an
+        (id, time_in, time_out) row (None meaning the student has no record yet).
+        """
+        record_loaded = current_record is not _RECORD_NOT_LOADED
+        # Only the name is needed; room existence is left to the foreign keys
+        student_name = _student_full_name(student_id)
+        
+        if student_name is None:
+            return _STUDENT_NOT_FOUND.copy()
+        
+        # Validate session timing
+        timing_result = self._validate_session_timing(session)
+        if not timing_result['valid']:
+            return {
+                'success': False,
+                'message': timing_result['error'],
+                'action': 'error'
+            }
+        
+        current_time = timing_result['current_time']
+        session_start = timing_result['session_start']
+        session_end = timing_result['session_end']
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "%s timing current=%s start=%s end=%s",
+                type(session).__name__, current_time, session_start, session_end
+            )
+        
+        # Grace periods are precomputed with the cached session timing
+        time_in_grace_start = timing_result['time_in_grace_start']
+        time_out_grace_start = timing_result['time_out_grace_start']
+        time_out_grace_end = timing_result['time_out_grace_end']
+        
+        # Check if in grace periods
+        in_time_in_grace = time_in_grace_start <= current_time < session_start
+        in_time_out_grace = time_out_grace_start <= current_time <= time_out_grace_end
+        
+        # FIRST TAP - TIME IN (grace period or active session)
+        if (not record_loaded or current_record is None) and time_in_grace_start <= current_time <= session_end:
+            # LATE if arrived AFTER session started (not during grace period)
+            is_late = current_time >= session_start  # Late if arrived after session start
+            
+            record_id = self._insert_time_in_record({
+                'student_id': student_id,
+                'room_id': room_id,
+                'session_id': session.id if link_attr == 'session_id' else None,
+                'schedule_session_id': session.id if link_attr == 'schedule_session_id' else None,
+                'time_in': current_time,  # current_time (not UTC)
+                'scan_time': current_time,
+                'time_in_scanned_by': scanned_by,
+                'scanned_by': scanned_by,
+                'is_late': is_late,
+                'is_active': True
+            }, link_attr, check_existing=not record_loaded)
+            
+            if record_id is not None:
+                # Update success message based on timing
+                if in_time_in_grace:
+                    status_msg = " (GRACE PERIOD - ON TIME)"
+                elif is_late:
+                    status_msg = " (MARKED AS LATE)"
+                else:
+                    status_msg = ""
+                
                 return {
-                    'success': False,
-                    'message': timing_result['error'],
-                    'action': 'error'
+                    'success': True,
+                    'message': f'Time in successful{status_msg}! Welcome {student_name}',
+                    'action': 'time_in',
+                    'is_late': is_late,
+                    'in_grace_period': in_time_in_grace,
+                    'time_in': current_time.isoformat(timespec='seconds')
                 }
-            
+        
+            record_loaded = False  # Lost an insert race; re-read the winning record
+        
+        if not record_loaded:
             # Get current attendance record for THIS SPECIFIC SESSION ONLY (session isolation)
-            current_record = AttendanceRecord.query.filter_by(
-                student_id=student_id,
-                session_id=session_id  # Only THIS session
+            current_record = db.session.execute(
+                select(*_RECORD_TIME_COLUMNS).where(
+                    AttendanceRecord.student_id == student_id,
+                    getattr(AttendanceRecord, link_attr) == session.id  # Only THIS session
+                )
             ).first()
-            
-            current_time = timing_result['current_time']
-            session_start = timing_result['session_start']
-            session_end = timing_result['session_end']
-            
-            # Calculate grace periods
-            time_in_grace_start = session_start - timedelta(minutes=15)  # 15 mins BEFORE session
-            time_out_grace_start = session_end  # Right after session ends
-            time_out_grace_end = session_end + timedelta(minutes=15)  # 15 mins AFTER session
-            
-            # Check if in grace periods
-            in_time_in_grace = time_in_grace_start <= current_time < session_start
-            in_time_out_grace = time_out_grace_start <= current_time <= time_out_grace_end
-            
-            # FIRST TAP - TIME IN
-            if current_record is None:
-                # Check if we can time in
-                if current_time < time_in_grace_start:
-                    # Too early - before grace period
-                    time_diff = time_in_grace_start - current_time
-                    hours = int(time_diff.total_seconds() // 3600)
-                    minutes = int((time_diff.total_seconds() % 3600) // 60)
+        
+        if current_record is None:
+            if current_time < time_in_grace_start:
+                # Too early - before grace period
+                time_diff = time_in_grace_start - current_time
+                hours = int(time_diff.total_seconds() // 3600)
+                minutes = int((time_diff.total_seconds() % 3600) // 60)
+                return {
+                    'success': False,
+                    'message': f'Too early to time in. Time-in opens in {hours}h {minutes}m (15 minutes before session).',
+                    'action': 'error'
+                }
+            else:
+                # Session already ended
+                return _SESSION_ENDED.copy()
+        
+        # SECOND TAP - ALREADY TIMED IN
+        elif current_record.time_in and not current_record.time_out:
+            # Check if in time-out grace period
+            if in_time_out_grace:
+                # TIME OUT - Grace period active (single-column UPDATE, no ORM dirty tracking)
+                db.session.execute(
+                    update(AttendanceRecord)
+                    .where(AttendanceRecord.id == current_record.id)
+                    .values(time_out=current_time)
+                )
+                db.session.commit()
+                
+                return {
+                    'success': True,
+                    'message': f'Time out successful! (GRACE PERIOD) Thank you {student_name}',
+                    'action': 'time_out',
+                    'in_grace_period': True,
+                    'time_in': current_record.time_in.isoformat(timespec='seconds'),
+                    'time_out': current_time.isoformat(timespec='seconds')
+                }
+            else:
+                # NOT in grace period - just show notification
+                time_in_str = _format_clock_time(current_record.time_in)
+                time_in_iso = current_record.time_in.isoformat(timespec='seconds')
+                
+                if current_time < session_end:
+                    # Session still active
+                    minutes_until_end = int((session_end - current_time).total_seconds() / 60)
                     return {
                         'success': False,
-                        'message': f'Too early to time in. Time-in opens in {hours}h {minutes}m (15 minutes before session).',
-                        'action': 'error'
-                    }
-                elif current_time <= session_end:
-                    # Can time in (grace period or active session)
-                    # LATE if arrived AFTER session started (not during grace period)
-                    is_late = current_time >= session_start  # Late if arrived after session start
-                    
-                    # Create attendance record (constructor doesn't accept time_in)
-                    new_record = AttendanceRecord(
-                        student_id=student_id,
-                        room_id=room_id,
-                        session_id=session_id,  # Link to THIS session only
-                        scanned_by=scanned_by,
-                        is_late=is_late
-                    )
-                    
-                    # Update time_in to current_time (not UTC)
-                    new_record.time_in = current_time
-                    new_record.scan_time = current_time
-                    
-                    db.session.add(new_record)
-                    db.session.commit()
-                    
-                    # Update success message based on timing
-                    if in_time_in_grace:
-                        status_msg = " (GRACE PERIOD - ON TIME)"
-                    elif is_late:
-                        status_msg = " (MARKED AS LATE)"
-                    else:
-                        status_msg = ""
-                    
-                    return {
-                        'success': True,
-                        'message': f'Time in successful{status_msg}! Welcome {student.get_full_name()}',
-                        'action': 'time_in',
-                        'is_late': is_late,
-                        'in_grace_period': in_time_in_grace,
-                        'time_in': current_time.isoformat()
+                        'message': f'You are already timed in since {time_in_str}. Time-out will be available in {minutes_until_end} minutes (15-min grace period after session ends).',
+                        'action': 'already_timed_in',
+                        'time_in': time_in_iso
                     }
                 else:
-                    # Session already ended
+                    # Grace period expired
                     return {
                         'success': False,
-                        'message': 'Cannot time in - session has ended',
-                        'action': 'error'
+                        'message': f'You were timed in at {time_in_str}, but the 15-minute grace period for time-out has expired.',
+                        'action': 'grace_expired',
+                        'time_in': time_in_iso
                     }
-            
-            # SECOND TAP - ALREADY TIMED IN
-            elif current_record.time_in and not current_record.time_out:
-                # Check if in time-out grace period
-                if in_time_out_grace:
-                    # TIME OUT - Grace period active
-                    current_record.time_out = current_time
-                    db.session.commit()
-                    
-                    return {
-                        'success': True,
-                        'message': f'Time out successful! (GRACE PERIOD) Thank you {student.get_full_name()}',
-                        'action': 'time_out',
-                        'in_grace_period': True,
-                        'time_in': current_record.time_in.isoformat(),
-                        'time_out': current_time.isoformat()
-                    }
-                else:
-                    # NOT in grace period - just show notification
-                    time_in_str = current_record.time_in.strftime("%I:%M %p")
-                    
-                    if current_time < session_end:
-                        # Session still active
-                        minutes_until_end = int((session_end - current_time).total_seconds() / 60)
-                        return {
-                            'success': False,
-                            'message': f'You are already timed in since {time_in_str}. Time-out will be available in {minutes_until_end} minutes (15-min grace period after session ends).',
-                            'action': 'already_timed_in',
-                            'time_in': current_record.time_in.isoformat()
-                        }
-                    else:
-                        # Grace period expired
-                        return {
-                            'success': False,
-                            'message': f'You were timed in at {time_in_str}, but the 15-minute grace period for time-out has expired.',
-                            'action': 'grace_expired',
-                            'time_in': current_record.time_in.isoformat()
-                        }
-            
-            # ALREADY COMPLETED
-            else:
-                return {
-                    'success': False,
-                    'message': f'You have already completed attendance for this session. Timed in at {current_record.time_in.strftime("%I:%M %p")} and timed out at {current_record.time_out.strftime("%I:%M %p")}.',
-                    'action': 'complete'
-                }
         
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            logger.error(f"Error processing attendance scan: {str(e)}\n{error_details}")
-            
-            # Write error to file for debugging
-            with open('debug_error.txt', 'w') as f:
-                f.write(f"Error in process_attendance_scan:\n")
-                f.write(f"Error message: {str(e)}\n")
-                f.write(f"Full traceback:\n{error_details}\n")
-            
+        # ALREADY COMPLETED
+        else:
             return {
                 'success': False,
-                'message': 'System error occurred while processing attendance',
-                'action': 'error'
+                'message': f'You have already completed attendance for this session. Timed in at {_format_clock_time(current_record.time_in)} and timed out at {_format_clock_time(current_record.time_out)}.',
+                'action': 'complete'
             }
     
+    def _insert_time_in_record(self, values, link_column, check_existing=True):
+        """
+        Insert a time-in record in a single statement.
+        Where link_column is covered by a unique index (and the dialect supports it)
+        this is INSERT ... ON CONFLICT DO NOTHING, so concurrent taps cannot create
+        duplicates. Returns the new record id, or None when the student already has
+        a record for the session in link_column. check_existing=False skips the
+        existence probe on the fallback path when the caller has just loaded it.
+        """
+        dialect_insert = _CONFLICT_INSERTS.get(db.engine.dialect.name)
+        
+        if dialect_insert is not None and link_column in _UNIQUE_LINK_COLUMNS:
+            stmt = dialect_insert(AttendanceRecord).values(**values).on_conflict_do_nothing(
+                index_elements=['student_id', link_column],
+                index_where=getattr(AttendanceRecord, link_column).isnot(None)  # partial index predicate
+            ).returning(AttendanceRecord.id)
+            record_id = db.session.execute(stmt).scalar()
+        else:
+            if check_existing and db.session.query(AttendanceRecord.id).filter_by(
+                student_id=values['student_id'],
+                **{link_column: values[link_column]}
+            ).first():
+                return None
+            record_id = db.session.execute(
+                insert(AttendanceRecord).values(**values)
+            ).inserted_primary_key[0]
+        
+        db.session.commit()
+        return record_id
+    
     def _validate_session_timing(self, session):
         """
         Validate session timing - DISABLED FOR FRESH START
         Always returns valid so you can implement your own logic
         """
         try:
-            # Determine timezone based on session type
-            if hasattr(session, 'get_session_datetime'):
-                # SessionSchedule model - times are in local timezone
-                current_time = datetime.now()
-                session_start = session.get_session_datetime()
-                session_end = session.get_session_end_datetime()
-            else:
-                # AttendanceSession model - ALSO uses local time (not UTC!)
-                current_time = datetime.now()  # Changed from datetime.utcnow()
-                if hasattr(session, 'start_datetime') and hasattr(session, 'end_datetime'):
-                    session_start = session.start_datetime
-                    session_end = session.end_datetime
-                elif hasattr(session, 'start_time') and hasattr(session, 'end_time'):
-                    session_start = session.start_time
-                    session_end = session.end_time
-                else:
-                    return {
-                        'valid': False,
-                        'error': 'Invalid session model - missing time fields'
-                    }
+            # Both session models use local time (not UTC!)
+            current_time = _scan_clock()
+            
+            timing = _get_session_timing(session)
+            if timing is None:
+                return {
+                    'valid': False,
+                    'error': 'Invalid session model - missing time fields'
+                }
+            (session_start, session_end, time_in_grace_start, time_out_grace_start,
+             time_out_grace_end, is_active, qr_code_active) = timing
             
             # Check if session is active
-            if hasattr(session, 'is_active') and not session.is_active:
+            if not is_active:
                 return {
                     'valid': False,
                     'error': 'Session is inactive'
                 }
             
             # For SessionSchedule, check QR code active and status
-            if hasattr(session, 'qr_code_active') and not session.qr_code_active:
+            if not qr_code_active:
                 return {
                     'valid': False,
                     'error': 'QR code scanning is disabled for this session'
@@ -428,7 +476,10 @@ class NewAttendanceService:
                 'session_active': True,
                 'current_time': current_time,
                 'session_start': session_start,
-                'session_end': session_end
+                'session_end': session_end,
+                'time_in_grace_start': time_in_grace_start,
+                'time_out_grace_start': time_out_grace_start,
+                'time_out_grace_end': time_out_grace_end
             }
         
         except Exception as e:
@@ -463,7 +514,7 @@ class NewAttendanceService:
     def _process_schedule_time_in(self, student, room, session_schedule, scanned_by, timing_result):
         """Process time-in for SessionSchedule"""
         try:
-            current_time = datetime.now()
+            current_time = _scan_clock()
             
             # Calculate if late (more than 5 minutes after start)
             session_start = session_schedule.get_session_datetime()
@@ -521,11 +572,14 @@ class NewAttendanceService:
     def _process_schedule_time_out(self, record, scanned_by, timing_result):
         """Process time-out for SessionSchedule"""
         try:
-            current_time = datetime.now()
+            current_time = _scan_clock()
             
-            # Update existing record
-            record.time_out = current_time
-            record.scanned_by = scanned_by  # Update who scanned them out
+            # Update existing record (and who scanned them out) in one UPDATE
+            db.session.execute(
+                update(AttendanceRecord)
+                .where(AttendanceRecord.id == record.id)
+                .values(time_out=current_time, scanned_by=scanned_by)
+            )
             
             # Calculate duration
             if record.time_in:
@@ -559,15 +613,14 @@ class NewAttendanceService:
     def _process_time_in(self, student, room, session, scanned_by, timing_result):
         """Process time-in for student"""
         try:
-            # Use consistent timezone handling with validation method
-            if hasattr(session, 'session_date'):
-                # SessionSchedule - use local time
-                current_time = datetime.now()
-                session_start = session.get_session_datetime() if hasattr(session, 'get_session_datetime') else None
+            # Same clock as the validation method for both session models
+            current_time = _scan_clock()
+            is_schedule_session = isinstance(session, SessionSchedule)
+            if is_schedule_session:
+                session_start = session.get_session_datetime()
             else:
-                # AttendanceSession - use UTC time
-                current_time = datetime.utcnow()
-                session_start = getattr(session, 'start_time', None) or getattr(session, 'start_datetime', None)
+                # AttendanceSession
+                session_start = session.start_time
             
             # NEW LOGIC: Student is late if they time in BEFORE official session start
             # (during the 15-minute grace period before session)
@@ -586,9 +639,6 @@ class NewAttendanceService:
             else:
                 late_status = ""
             
-            # Determine if this is a SessionSchedule or AttendanceSession
-            is_schedule_session = hasattr(session, 'title')  # SessionSchedule has title, AttendanceSession has session_name
-            
             # Create new attendance record using correct constructor
             record = AttendanceRecord(
                 student_id=student.id,
@@ -606,6 +656,8 @@ class NewAttendanceService:
             
             # Set additional fields manually
             record.time_in_scanned_by = scanned_by
+            record.time_in = current_time
+            record.scan_time = current_time
             
             db.session.add(record)
             db.session.commit()
@@ -629,7 +681,7 @@ class NewAttendanceService:
         """Process time-out for student"""
         try:
             # Update existing record with time-out
-            current_record.time_out = datetime.utcnow()
+            current_record.time_out = _scan_clock()
             current_record.time_out_scanned_by = scanned_by
             current_record.is_active = False
             
@@ -2,10 +2,14 @@
 QR Code Image Processing Service
 Handles edge cases for QR code detection from uploaded images
 """
-import io
+import json
 import logging
-from typing import Optional, List, Dict, Any
+import re
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Tuple
+from flask import has_request_context, request
 from PIL import Image
+from app.utils.qr_utils import _get_qr_detector
 
 # Optional imports with fallbacks
 try:
@@ -24,8 +28,57 @@ except ImportError:
     PYZBAR_AVAILABLE = False
     pyzbar = None
 
+# orjson parses small payloads several times faster; its errors subclass json.JSONDecodeError
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# Script/markup injection markers rejected in QR payloads (single case-insensitive pass)
+_DANGEROUS_QR_PATTERN = re.compile(r'<script|javascript:|data:|vbscript:|<iframe', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def _check_qr_payload(qr_data: str) -> Tuple[bool, Optional[str], bool]:
+    """
+    Cached (valid, error, standard_format) verdict for a decoded QR payload
+    Repeat scans of the same code skip the format checks entirely; logging is
+    left to the caller so it happens on every scan.
+    """
+    # Check for empty/whitespace data
+    if not qr_data or not qr_data.strip():
+        return False, 'QR code contains empty or whitespace-only data', False
+    
+    # Check data length (reasonable limit)
+    if len(qr_data) > 1000:  # Reasonable limit for QR codes
+        return False, f'QR code data too long ({len(qr_data)} characters)', False
+    
+    # Check for potential script injection
+    if _DANGEROUS_QR_PATTERN.search(qr_data):
+        return False, 'QR code contains potentially malicious content', False
+    
+    # Basic format validation - should be student QR format
+    # Expected formats: SCANME_hash, STU123, or JSON
+    if qr_data.startswith('SCANME_') or qr_data.startswith('STU') or qr_data.startswith('{'):
+        return True, None, True
+    
+    # Try to parse as JSON for legacy formats (only objects qualify, so plain
+    # student numbers skip the parse and its exception entirely)
+    if qr_data.lstrip()[:1] == '{':
+        try:
+            parsed = _json_loads(qr_data)
+            if isinstance(parsed, dict) and ('student_id' in parsed or 'student_no' in parsed):
+                return True, None, True
+        except (json.JSONDecodeError, TypeError):
+            pass
+    
+    # Allow other formats (the caller logs them)
+    return True, None, False
+
+
 class QRImageProcessingService:
     """
     Service for processing QR codes from uploaded images
@@ -45,6 +98,9 @@ class QRImageProcessingService:
     MAX_IMAGE_WIDTH = 2048
     MAX_IMAGE_HEIGHT = 2048
     
+    # Images at least this large (shorter side, px) are enhanced at half size first
+    ENHANCEMENT_DOWNSAMPLE_MIN_SIZE = 800
+    
     @classmethod
     def validate_image_file(cls, file) -> Dict[str, Any]:
         """
@@ -68,15 +124,26 @@ class QRImageProcessingService:
                 return {'valid': False, 'error': 'No file selected'}
             
             # Check file size
-            file.seek(0, 2)  # Seek to end
-            file_size = file.tell()
-            file.seek(0)     # Reset to beginning
-            
-            if file_size == 0:
-                return {'valid': False, 'error': 'File is empty'}
-            
-            if file_size > cls.MAX_FILE_SIZE:
-                return {'valid': False, 'error': f'File size ({file_size / 1024 / 1024:.1f}MB) exceeds maximum allowed size (5MB)'}
+            declared_size = cls._declared_upload_size(file)
+            if declared_size and declared_size <= cls.MAX_FILE_SIZE:
+                # Content-Length already proves the upload fits; only emptiness is
+                # left, so peek one byte rather than seeking the spooled file to its end
+                stream = getattr(file, 'stream', file)
+                is_empty = not stream.read(1)
+                stream.seek(0)
+                
+                if is_empty:
+                    return {'valid': False, 'error': 'File is empty'}
+            else:
+                file.seek(0, 2)  # Seek to end
+                file_size = file.tell()
+                file.seek(0)     # Reset to beginning
+                
+                if file_size == 0:
+                    return {'valid': False, 'error': 'File is empty'}
+                
+                if file_size > cls.MAX_FILE_SIZE:
+                    return {'valid': False, 'error': f'File size ({file_size / 1024 / 1024:.1f}MB) exceeds maximum allowed size (5MB)'}
             
             # Check content type
             if hasattr(file, 'content_type') and file.content_type not in cls.SUPPORTED_FORMATS:
@@ -88,6 +155,17 @@ class QRImageProcessingService:
             logger.error(f"Error validating image file: {str(e)}")
             return {'valid': False, 'error': 'Failed to validate file'}
     
+    @staticmethod
+    def _declared_upload_size(file) -> Optional[int]:
+        """
+        Upper bound on the upload size from the request's Content-Length, if any.
+        Only the request-level header is used: Werkzeug limits the body to it,
+        whereas a multipart part's own Content-Length is not enforced.
+        """
+        if has_request_context():
+            return request.content_length
+        return None
+    
     @classmethod
     def extract_qr_codes(cls, file) -> Dict[str, Any]:
         """
@@ -119,10 +197,14 @@ class QRImageProcessingService:
                     'details': {'missing_libraries': ['pyzbar']}
                 }
             
-            # Read the uploaded file
-            image_data = file.read()
+            # Decode straight from the upload stream (Werkzeug spools it already),
+            # rather than copying the whole body into a bytes object first
+            stream = getattr(file, 'stream', file)
+            stream.seek(0, 2)
+            file_size = stream.tell()
+            stream.seek(0)
             
-            if not image_data:
+            if not file_size:
                 return {
                     'success': False,
                     'qr_codes': [],
@@ -132,7 +214,7 @@ class QRImageProcessingService:
             
             # Try to open with PIL
             try:
-                image = Image.open(io.BytesIO(image_data))
+                image = Image.open(stream)
             except Exception as e:
                 logger.error(f"Failed to open image with PIL: {str(e)}")
                 return {
@@ -145,13 +227,16 @@ class QRImageProcessingService:
             # Check image dimensions
             width, height = image.size
             if width > cls.MAX_IMAGE_WIDTH or height > cls.MAX_IMAGE_HEIGHT:
-                # Resize large images to improve processing speed
-                image.thumbnail((cls.MAX_IMAGE_WIDTH, cls.MAX_IMAGE_HEIGHT), Image.Resampling.LANCZOS)
+                # JPEGs can be decoded straight to a reduced-scale grayscale image
+                # (shrink-on-load); other formats are resized after decoding
+                image.draft('L', (cls.MAX_IMAGE_WIDTH, cls.MAX_IMAGE_HEIGHT))
+                if image.size[0] > cls.MAX_IMAGE_WIDTH or image.size[1] > cls.MAX_IMAGE_HEIGHT:
+                    image.thumbnail((cls.MAX_IMAGE_WIDTH, cls.MAX_IMAGE_HEIGHT), Image.Resampling.LANCZOS)
                 logger.info(f"Resized large image from {width}x{height} to {image.size}")
             
-            # Convert to RGB if necessary (handle different color modes)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            # QR detection only needs luminance
+            if image.mode != 'L':
+                image = image.convert('L')
             
             # Detect QR codes using available methods
             qr_codes = cls._detect_qr_codes_with_available_libraries(image)
@@ -163,7 +248,7 @@ class QRImageProcessingService:
                     'error': 'No QR code found in the image. Please ensure the image contains a clear, valid student QR code.',
                     'details': {
                         'image_size': f"{width}x{height}",
-                        'file_size': len(image_data),
+                        'file_size': file_size,
                         'cv2_available': CV2_AVAILABLE,
                         'pyzbar_available': PYZBAR_AVAILABLE
                     }
@@ -215,7 +300,7 @@ class QRImageProcessingService:
                 'error': None,
                 'details': {
                     'image_size': f"{width}x{height}",
-                    'file_size': len(image_data),
+                    'file_size': file_size,
                     'detection_method': 'pyzbar' + (' + opencv' if CV2_AVAILABLE else '')
                 }
             }
@@ -233,6 +318,7 @@ class QRImageProcessingService:
     def _detect_qr_codes_with_available_libraries(cls, pil_image) -> List[str]:
         """
         Detect QR codes using available libraries with fallback methods
+        Expects the grayscale ('L') image prepared by extract_qr_codes
         """
         qr_codes = []
         
@@ -240,127 +326,121 @@ class QRImageProcessingService:
             logger.warning("pyzbar not available, cannot detect QR codes from images")
             return qr_codes
         
-        # Method 1: Direct PIL to pyzbar detection
+        # Method 1: Direct PIL to pyzbar detection (image is already grayscale)
         try:
-            detected = pyzbar.decode(pil_image)
-            for qr in detected:
-                try:
-                    data = qr.data.decode('utf-8')
-                    qr_codes.append(data)
-                except UnicodeDecodeError:
-                    logger.warning(f"QR code contains binary data: {qr.data}")
-                    continue
+            qr_codes = cls._decode_qr_codes(pil_image)
         except Exception as e:
             logger.debug(f"PIL direct detection failed: {str(e)}")
         
         # If OpenCV is available, try enhanced methods
         if CV2_AVAILABLE and not qr_codes:
             try:
-                # Convert PIL to OpenCV format
-                opencv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-                qr_codes = cls._detect_qr_codes_multiple_methods(opencv_image)
+                # Single-channel view of the image; asarray avoids a copy for 'L' images
+                if pil_image.mode != 'L':
+                    pil_image = pil_image.convert('L')
+                gray = np.asarray(pil_image)
+                qr_codes = cls._detect_qr_codes_multiple_methods(gray)
             except Exception as e:
                 logger.debug(f"OpenCV detection failed: {str(e)}")
         
-        # If still no QR codes and we have basic image processing, try simple enhancements
-        if not qr_codes:
+        return qr_codes
+    
+    @staticmethod
+    def _decode_qr_codes(image) -> List[str]:
+        """Decode QR codes with pyzbar, skipping binary (non UTF-8) payloads"""
+        qr_codes = []
+        for qr in pyzbar.decode(image):
             try:
-                # Convert to grayscale using PIL
-                gray_image = pil_image.convert('L')
-                detected = pyzbar.decode(gray_image)
-                for qr in detected:
-                    try:
-                        data = qr.data.decode('utf-8')
-                        if data not in qr_codes:
-                            qr_codes.append(data)
-                    except UnicodeDecodeError:
-                        continue
-            except Exception as e:
-                logger.debug(f"Grayscale detection failed: {str(e)}")
-        
+                data = qr.data.decode('utf-8')
+            except UnicodeDecodeError:
+                # Handle binary data edge case
+                logger.warning(f"QR code contains binary data: {qr.data}")
+                continue
+            if data not in qr_codes:
+                qr_codes.append(data)
         return qr_codes
     
     @classmethod
-    def _detect_qr_codes_multiple_methods(cls, opencv_image) -> List[str]:
+    def _detect_qr_codes_multiple_methods(cls, gray) -> List[str]:
         """
-        Try multiple detection methods for better success rate
+        Try multiple detection methods for better success rate on a grayscale
+        (single-channel uint8) image
         Handles edge case: Poor Image Quality
         Only works when OpenCV is available
+        
+        Plain decoding of the image has already been tried by the caller on the
+        same grayscale data. OpenCV's QRCodeDetector is tried next; only if it
+        also fails do the enhancement methods run, stopping at the first method
+        that finds a code.
         """
         qr_codes = []
         
         if not CV2_AVAILABLE or not PYZBAR_AVAILABLE:
             return qr_codes
         
-        # Method 1: Direct detection
-        try:
-            detected = pyzbar.decode(opencv_image)
-            for qr in detected:
-                try:
-                    data = qr.data.decode('utf-8')
-                    qr_codes.append(data)
-                except UnicodeDecodeError:
-                    # Handle binary data edge case
-                    logger.warning(f"QR code contains binary data: {qr.data}")
-                    continue
-        except Exception as e:
-            logger.debug(f"Direct detection failed: {str(e)}")
+        # OpenCV's own detector often reads codes pyzbar misses, in one native pass
+        qr_codes = cls._detect_with_opencv_detector(gray)
+        if qr_codes:
+            return qr_codes
         
-        # If no QR codes found, try image enhancement methods
-        if not qr_codes:
-            # Method 2: Convert to grayscale
-            try:
-                gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
-                detected = pyzbar.decode(gray)
-                for qr in detected:
-                    try:
-                        data = qr.data.decode('utf-8')
-                        if data not in qr_codes:
-                            qr_codes.append(data)
-                    except UnicodeDecodeError:
-                        continue
-            except Exception as e:
-                logger.debug(f"Grayscale detection failed: {str(e)}")
+        # QR modules survive a 2x box-filter downsample on large images, so try the
+        # cheaper quarter-size image first and only then the full resolution
+        candidates = [gray]
+        if min(gray.shape[:2]) >= cls.ENHANCEMENT_DOWNSAMPLE_MIN_SIZE:
+            candidates.insert(0, cv2.resize(gray, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA))
         
-        # Method 3: Apply Gaussian blur to reduce noise
-        if not qr_codes:
-            try:
-                blurred = cv2.GaussianBlur(opencv_image, (3, 3), 0)
-                detected = pyzbar.decode(blurred)
-                for qr in detected:
-                    try:
-                        data = qr.data.decode('utf-8')
-                        if data not in qr_codes:
-                            qr_codes.append(data)
-                    except UnicodeDecodeError:
-                        continue
-            except Exception as e:
-                logger.debug(f"Blur detection failed: {str(e)}")
+        for candidate in candidates:
+            qr_codes = cls._run_enhancement_methods(candidate)
+            if qr_codes:
+                break
         
-        # Method 4: Enhance contrast
-        if not qr_codes:
-            try:
-                # Convert to LAB color space and enhance L channel
-                lab = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2LAB)
-                l, a, b = cv2.split(lab)
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                l = clahe.apply(l)
-                enhanced = cv2.merge([l, a, b])
-                enhanced = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
-                
-                detected = pyzbar.decode(enhanced)
-                for qr in detected:
-                    try:
-                        data = qr.data.decode('utf-8')
-                        if data not in qr_codes:
-                            qr_codes.append(data)
-                    except UnicodeDecodeError:
-                        continue
-            except Exception as e:
-                logger.debug(f"Contrast enhancement detection failed: {str(e)}")
+        return qr_codes
+    
+    @staticmethod
+    def _detect_with_opencv_detector(gray) -> List[str]:
+        """Decode with cv2.QRCodeDetector (one detector per thread; it is not thread-safe)"""
+        try:
+            found, decoded, _, _ = _get_qr_detector(cv2).detectAndDecodeMulti(gray)
+        except Exception as e:
+            logger.debug(f"OpenCV QR detector failed: {str(e)}")
+            return []
+        
+        qr_codes = []
+        for data in (decoded if found else ()):
+            if data and data not in qr_codes:
+                qr_codes.append(data)
+        return qr_codes
+    
+    @classmethod
+    def _run_enhancement_methods(cls, gray) -> List[str]:
+        """Run the enhancement methods in order; the first to find a code wins"""
+        qr_codes = []
+        for method in (cls._decode_blurred, cls._decode_contrast_enhanced):
+            qr_codes = method(gray)
+            if qr_codes:
+                break
         
         return qr_codes
     
+    @classmethod
+    def _decode_blurred(cls, gray) -> List[str]:
+        """Method 2: Apply Gaussian blur to reduce noise"""
+        try:
+            return cls._decode_qr_codes(cv2.GaussianBlur(gray, (3, 3), 0))
+        except Exception as e:
+            logger.debug(f"Blur detection failed: {str(e)}")
+            return []
+    
+    @classmethod
+    def _decode_contrast_enhanced(cls, gray) -> List[str]:
+        """Method 3: Enhance contrast (pyzbar only looks at luminance, so CLAHE the gray channel)"""
+        try:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+            return cls._decode_qr_codes(clahe.apply(gray))
+        except Exception as e:
+            logger.debug(f"Contrast enhancement detection failed: {str(e)}")
+            return []
+    
     @classmethod
     def _validate_qr_data(cls, qr_data: str) -> Dict[str, Any]:
         """
@@ -374,39 +454,11 @@ class QRImageProcessingService:
         - Invalid Data Types: Non-string content
         """
         try:
-            # Check for empty/whitespace data
-            if not qr_data or not qr_data.strip():
-                return {'valid': False, 'error': 'QR code contains empty or whitespace-only data'}
-            
-            # Check data length (reasonable limit)
-            if len(qr_data) > 1000:  # Reasonable limit for QR codes
-                return {'valid': False, 'error': f'QR code data too long ({len(qr_data)} characters)'}
-            
-            # Check for potential script injection
-            dangerous_patterns = ['<script', 'javascript:', 'data:', 'vbscript:', '<iframe']
-            qr_lower = qr_data.lower()
-            for pattern in dangerous_patterns:
-                if pattern in qr_lower:
-                    return {'valid': False, 'error': 'QR code contains potentially malicious content'}
-            
-            # Basic format validation - should be student QR format
-            # Expected formats: SCANME_hash, STU123, or JSON
-            if qr_data.startswith('SCANME_') or qr_data.startswith('STU') or qr_data.startswith('{'):
-                return {'valid': True, 'error': None}
-            
-            # Try to parse as JSON for legacy formats
-            try:
-                import json
-                parsed = json.loads(qr_data)
-                if isinstance(parsed, dict) and ('student_id' in parsed or 'student_no' in parsed):
-                    return {'valid': True, 'error': None}
-            except (json.JSONDecodeError, TypeError):
-                pass
-            
-            # Allow other formats but log them
-            logger.info(f"QR code with non-standard format detected: {qr_data[:50]}...")
-            return {'valid': True, 'error': None}
+            valid, error, standard_format = _check_qr_payload(qr_data)
+            if valid and not standard_format:
+                logger.info(f"QR code with non-standard format detected: {qr_data[:50]}...")
+            return {'valid': valid, 'error': error}
             
         except Exception as e:
             logger.error(f"Error validating QR data: {str(e)}")
-            return {'valid': False, 'error': 'Failed to validate QR code data'}
\ No newline at end of file
+            return {'valid': False, 'error': 'Failed to validate QR code data'}
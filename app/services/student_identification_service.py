@@ -6,11 +6,34 @@ Handles comprehensive student lookup with edge case management
 from app import db
 from app.models.student_model import Student
 from sqlalchemy import or_, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Dialect-specific INSERT constructs that support ON CONFLICT DO NOTHING
+_CONFLICT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Column side of the case-insensitive lookups, built once instead of per call
+_STUDENT_NO_LOWER = func.lower(Student.student_no)
+_EMAIL_LOWER = func.lower(Student.email)
+
+# Student columns written when creating a student from QR data
+_STUDENT_INSERT_FIELDS = (
+    'student_no', 'first_name', 'last_name', 'email',
+    'department', 'section', 'year_level', 'qr_code_data'
+)
+
+def _is_email_conflict(error):
+    """Whether an IntegrityError comes from the unique students.email index"""
+    return 'email' in str(error.orig).lower()
+
+
 class StudentIdentificationService:
     """Service for handling student identification edge cases"""
     
@@ -77,14 +100,18 @@ class StudentIdentificationService:
             
             # Edge Case: Case sensitivity handling
             student = Student.query.filter(
-                func.lower(Student.student_no) == func.lower(student_no)
+                _STUDENT_NO_LOWER == func.lower(student_no)
             ).first()
             
             # Edge Case: Multiple students with similar numbers
+            # (anchored prefix match so the lookup stays on the student_no index;
+            # two rows are enough to tell a unique match from an ambiguous one,
+            # and only an ambiguous match needs the full count)
             if not student:
-                similar_students = Student.query.filter(
-                    Student.student_no.like(f'%{student_no}%')
-                ).all()
+                similar_query = Student.query.filter(
+                    Student.student_no.startswith(str(student_no), autoescape=True)
+                )
+                similar_students = similar_query.limit(2).all()
                 
                 if len(similar_students) == 1:
                     logger.info(f"Found similar student number match: {similar_students[0].student_no} for {student_no}")
@@ -94,7 +121,7 @@ class StudentIdentificationService:
                     return None, {
                         'error': f'Multiple students found with similar numbers to {student_no}',
                         'error_code': 'MULTIPLE_SIMILAR_STUDENTS',
-                        'similar_count': len(similar_students)
+                        'similar_count': similar_query.count()
                     }
             
             return student, None
@@ -119,11 +146,11 @@ class StudentIdentificationService:
             
         # Strategy 2: Student number lookup (with case insensitivity)
         if student_no:
-            lookup_conditions.append(func.lower(Student.student_no) == func.lower(str(student_no)))
+            lookup_conditions.append(_STUDENT_NO_LOWER == func.lower(str(student_no)))
         
         # Strategy 3: Email lookup (with case insensitivity)
         if email:
-            lookup_conditions.append(func.lower(Student.email) == func.lower(email))
+            lookup_conditions.append(_EMAIL_LOWER == func.lower(email))
         
         if not lookup_conditions:
             return None, {
@@ -131,21 +158,9 @@ class StudentIdentificationService:
                 'error_code': 'INSUFFICIENT_LOOKUP_DATA'
             }
         
-        # Execute lookup
+        # Execute lookup (a miss on the OR means no single condition matched either)
         student = Student.query.filter(or_(*lookup_conditions)).first()
         
-        # Edge Case: Multiple matches
-        if not student and len(lookup_conditions) > 1:
-            # Try individual conditions to identify conflicts
-            for condition in lookup_conditions:
-                matches = Student.query.filter(condition).all()
-                if len(matches) > 1:
-                    logger.warning(f"Multiple students match condition: {condition}")
-                    return None, {
-                        'error': 'Multiple students match the provided information',
-                        'error_code': 'MULTIPLE_MATCHES'
-                    }
-        
         # Edge Case: Name verification if student found
         if student and name:
             qr_name_lower = name.lower().strip()
@@ -187,35 +202,29 @@ class StudentIdentificationService:
         """Create student from legacy QR data"""
         student_no = validated_qr_data.get('student_no')
         
-        # Edge Case: Check for existing student_no
-        existing = Student.query.filter_by(student_no=student_no).first()
-        if existing:
-            return None, {
-                'error': f'Student number {student_no} already exists',
-                'error_code': 'DUPLICATE_STUDENT_NO'
-            }
-        
         # Generate basic information
         suffix = str(student_no)[-3:] if len(str(student_no)) >= 3 else str(student_no)
         first_name = "Student"
         last_name = suffix
         base_email = f"student{suffix}@university.edu"
         
-        # Edge Case: Handle email conflicts
-        email = StudentIdentificationService._generate_unique_email(base_email)
-        
         student = Student(
             student_no=student_no,
             first_name=first_name,
             last_name=last_name,
-            email=email,
+            email=base_email,
             department="General",
             section="Auto-Generated",
             year_level=1
         )
         
-        db.session.add(student)
-        db.session.flush()  # Get ID without full commit
+        # Edge Case: Existing student_no (checked by the insert itself)
+        student = StudentIdentificationService._insert_student(student, regenerate_email=True)
+        if student is None:
+            return None, {
+                'error': f'Student number {student_no} already exists',
+                'error_code': 'DUPLICATE_STUDENT_NO'
+            }
         
         logger.info(f"Created legacy student: {student.get_full_name()} ({student_no})")
         return student, None
@@ -230,36 +239,20 @@ class StudentIdentificationService:
         section = validated_qr_data.get('section', 'Unknown')
         year_level = validated_qr_data.get('year_level', 1)
         
-        # Edge Case: Parse name into first/last
-        name_parts = name.strip().split()
-        if len(name_parts) >= 2:
-            first_name = ' '.join(name_parts[:-1])
-            last_name = name_parts[-1]
+        # Edge Case: Parse name into first/last (last space-separated word is the surname)
+        first, sep, last = name.strip().rpartition(' ')
+        if sep:
+            first_name = first.rstrip()
+            last_name = last
         else:
             first_name = name
             last_name = "Unknown"
         
-        # Edge Case: Check for existing student_no
-        existing = Student.query.filter_by(student_no=student_no).first()
-        if existing:
-            return None, {
-                'error': f'Student number {student_no} already exists',
-                'error_code': 'DUPLICATE_STUDENT_NO'
-            }
-        
         # Generate email if not provided
         email = validated_qr_data.get('email')
-        if not email:
-            base_email = f"{first_name.lower().replace(' ', '.')}.{last_name.lower()}@university.edu"
-            email = StudentIdentificationService._generate_unique_email(base_email)
-        else:
-            # Edge Case: Check email conflicts
-            existing_email = Student.query.filter_by(email=email).first()
-            if existing_email:
-                return None, {
-                    'error': f'Email {email} already exists',
-                    'error_code': 'DUPLICATE_EMAIL'
-                }
+        generated_email = not email
+        if generated_email:
+            email = f"{first_name.lower().replace(' ', '.')}.{last_name.lower()}@university.edu"
         
         student = Student(
             student_no=student_no,
@@ -271,30 +264,94 @@ class StudentIdentificationService:
             year_level=year_level
         )
         
-        db.session.add(student)
-        db.session.flush()  # Get ID without full commit
+        # Edge Case: Existing student_no (checked by the insert itself)
+        try:
+            student = StudentIdentificationService._insert_student(
+                student, regenerate_email=generated_email
+            )
+        except IntegrityError as e:
+            # Edge Case: Check email conflicts (reported by the unique index)
+            if not _is_email_conflict(e):
+                raise
+            return None, {
+                'error': f'Email {email} already exists',
+                'error_code': 'DUPLICATE_EMAIL'
+            }
+        if student is None:
+            return None, {
+                'error': f'Student number {student_no} already exists',
+                'error_code': 'DUPLICATE_STUDENT_NO'
+            }
         
         logger.info(f"Created structured student: {student.get_full_name()} ({student_no})")
         return student, None
     
+    @staticmethod
+    def _insert_student(student, regenerate_email=False):
+        """
+        Insert a new (transient) student unless its student_no is already taken.
+        The insert runs optimistically inside a SAVEPOINT; with regenerate_email a
+        collision on the unique email index is retried once with a generated
+        unique address, otherwise the IntegrityError propagates. Returns the
+        persisted Student, or None when the student_no already exists.
+        """
+        try:
+            with db.session.begin_nested():
+                return StudentIdentificationService._insert_student_row(student)
+        except IntegrityError as e:
+            if not regenerate_email or not _is_email_conflict(e):
+                raise
+        
+        # Edge Case: Handle email conflicts (only looked up after an actual collision)
+        student.email = StudentIdentificationService._generate_unique_email(student.email)
+        with db.session.begin_nested():
+            return StudentIdentificationService._insert_student_row(student)
+    
+    @staticmethod
+    def _insert_student_row(student):
+        """
+        Uses INSERT ... ON CONFLICT (student_no) DO NOTHING RETURNING where the
+        dialect supports it, so the duplicate check and insert are one statement
+        and concurrent scans cannot both pass the check.
+        """
+        dialect_insert = _CONFLICT_INSERTS.get(db.engine.dialect.name)
+        
+        if dialect_insert is None:
+            if Student.query.filter_by(student_no=student.student_no).first():
+                return None
+            db.session.add(student)
+            db.session.flush()  # Get ID without full commit
+            return student
+        
+        values = {field: getattr(student, field) for field in _STUDENT_INSERT_FIELDS}
+        stmt = dialect_insert(Student).values(**values).on_conflict_do_nothing(
+            index_elements=['student_no']
+        ).returning(Student)
+        return db.session.scalars(stmt).first()
+    
     @staticmethod
     def _generate_unique_email(base_email):
         """Generate unique email address"""
-        email = base_email
-        counter = 1
+        name_part, domain = base_email.rsplit('@', 1)
         
-        while Student.query.filter_by(email=email).first():
-            name_part, domain = base_email.rsplit('@', 1)
+        # Fetch every candidate in one query, then pick the first free suffix locally
+        taken = {
+            email for (email,) in db.session.query(Student.email).filter(
+                Student.email.like(f"{name_part}%@{domain}")
+            )
+        }
+        
+        if base_email not in taken:
+            return base_email
+        
+        for counter in range(1, 1000):
             email = f"{name_part}{counter}@{domain}"
-            counter += 1
-            
-            # Edge Case: Prevent infinite loop
-            if counter > 1000:
-                timestamp = datetime.now().strftime('%H%M%S')
-                email = f"{name_part}_{timestamp}@{domain}"
-                break
+            if email not in taken:
+                return email
         
-        return email
+        # Edge Case: Prevent infinite loop
+        timestamp = datetime.now().strftime('%H%M%S')
+        return f"{name_part}_{timestamp}@{domain}"
     
     @staticmethod
     def validate_student_for_attendance(student):
@@ -10,14 +10,70 @@ Handles all time calculation edge cases from QR_ATTENDANCE_EDGE_CASES.md:
 - Daylight Saving Time transitions
 """
 
-from datetime import datetime, timedelta, timezone, time
-import pytz
+from datetime import datetime, timedelta, timezone
 import logging
+import time
+import numpy as np
+from functools import lru_cache
 from typing import Tuple, Optional, Dict, Any
-from sqlalchemy import and_, or_
+from sqlalchemy import bindparam, select
+from app import db
+from app.models.attendance_model import AttendanceSession
+
+# Optional JIT for the integer duration kernel; plain Python without numba
+try:
+    from numba import njit
+    _jit = njit(cache=True)
+except ImportError:
+    def _jit(func):
+        return func
 
 logger = logging.getLogger(__name__)
 
+# UTC tzinfo singleton; datetimes already in UTC only need their tzinfo dropped
+_UTC = timezone.utc
+
+# March and November: DST transition months for most regions
+_DST_TRANSITION_MONTHS = frozenset((3, 11))
+
+# timedelta // _ONE_MICROSECOND gives an exact integer microsecond count
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+_MICROSECONDS_PER_MINUTE = 60 * 1000000
+
+# Zero-padded "00".."99" for formatting HH:MM durations without a format call
+_TWO_DIGITS = tuple(f"{i:02d}" for i in range(100))
+
+
+@lru_cache(maxsize=16)
+def _grace_period(minutes: int) -> timedelta:
+    """Grace period timedelta, shared across calls with the same length"""
+    return timedelta(minutes=minutes)
+
+
+@_jit
+def _duration_kernel(duration_us, min_us, max_us):
+    """
+    Integer breakdown of a duration given in microseconds:
+    (seconds, minutes, hours, display minutes, is_short, is_extreme)
+    """
+    # Truncate toward zero like int(timedelta.total_seconds())
+    if duration_us >= 0:
+        total_seconds = duration_us // 1000000
+    else:
+        total_seconds = -(-duration_us // 1000000)
+    total_minutes = total_seconds // 60
+    return (total_seconds, total_minutes, total_minutes // 60, total_minutes % 60,
+            duration_us < min_us, duration_us > max_us)
+
+
+def _as_datetime64(times: list) -> np.ndarray:
+    """datetime64[us] array of naive UTC times (aware datetimes are converted first)"""
+    if times and times[0].tzinfo is not None:
+        times = [t.astimezone(_UTC).replace(tzinfo=None) for t in times]
+    return np.array(times, dtype='datetime64[us]')
+
+
 class TimeManagementService:
     """Service for handling time calculations with edge case management"""
     
@@ -43,74 +99,9 @@ class TimeManagementService:
             Dict with duration info and any warnings/corrections applied
         """
         try:
-            # Use current time if time_out not provided
-            if time_out is None:
-                time_out = datetime.utcnow()
-            
-            # Normalize both times to same timezone
-            normalized_times = TimeManagementService._normalize_time_pair(time_in, time_out)
-            norm_time_in = normalized_times['time_in']
-            norm_time_out = normalized_times['time_out']
-            
-            # Check for negative duration (Edge Case)
-            raw_duration = norm_time_out - norm_time_in
-            
-            corrections_applied = []
-            warnings = []
-            
-            # Handle negative duration
-            if raw_duration.total_seconds() < 0:
-                corrections_applied.append("negative_duration_correction")
-                warnings.append(f"Negative duration detected: {raw_duration}. Applying correction.")
-                
-                # Try different correction strategies
-                correction_result = TimeManagementService._correct_negative_duration(
-                    norm_time_in, norm_time_out
-                )
-                norm_time_out = correction_result['corrected_time_out']
-                raw_duration = norm_time_out - norm_time_in
-                corrections_applied.extend(correction_result['corrections'])
-                warnings.extend(correction_result['warnings'])
-            
-            # Check for extremely short duration
-            if raw_duration.total_seconds() < (TimeManagementService.MIN_REASONABLE_DURATION_MINUTES * 60):
-                warnings.append(f"Very short duration detected: {raw_duration.total_seconds()} seconds")
-            
-            # Check for extremely long duration
-            max_seconds = TimeManagementService.MAX_REASONABLE_DURATION_HOURS * 3600
-            if raw_duration.total_seconds() > max_seconds:
-                warnings.append(f"Extremely long duration detected: {raw_duration.total_seconds() / 3600:.1f} hours")
-                corrections_applied.append("extreme_duration_flagged")
-            
-            # Handle midnight crossover
-            midnight_info = TimeManagementService._analyze_midnight_crossover(norm_time_in, norm_time_out)
-            if midnight_info['crosses_midnight']:
-                warnings.append("Session crosses midnight boundary")
-            
-            # Calculate final duration in various formats
-            total_seconds = int(raw_duration.total_seconds())
-            total_minutes = total_seconds // 60
-            hours = total_minutes // 60
-            minutes = total_minutes % 60
-            
-            return {
-                'success': True,
-                'duration_seconds': total_seconds,
-                'duration_minutes': total_minutes,
-                'duration_hours': hours,
-                'duration_display_minutes': minutes,
-                'duration_formatted': f"{hours:02d}:{minutes:02d}",
-                'time_in': norm_time_in,
-                'time_out': norm_time_out,
-                'crosses_midnight': midnight_info['crosses_midnight'],
-                'date_span_days': midnight_info['date_span_days'],
-                'corrections_applied': corrections_applied,
-                'warnings': warnings,
-                'is_reasonable_duration': len([w for w in warnings if 'extreme' in w.lower()]) == 0
-            }
-            
+            return TimeManagementService._calculate_duration_safe_impl(time_in, time_out)
         except Exception as e:
-            logger.error(f"Error calculating duration: {str(e)}")
+            logger.exception("Error calculating duration: %s", e)
             return {
                 'success': False,
                 'error': str(e),
@@ -119,6 +110,77 @@ class TimeManagementService:
                 'warnings': [f"Duration calculation failed: {str(e)}"]
             }
     
+    @staticmethod
+    def _calculate_duration_safe_impl(time_in: datetime, time_out: Optional[datetime]) -> Dict[str, Any]:
+        """Body of calculate_duration_safe; exceptions are handled by the caller"""
+        # Use current time if time_out not provided
+        if time_out is None:
+            time_out = datetime.utcnow()
+        
+        # Normalize both times to same timezone (naive pairs, the usual case, already are)
+        if time_in.tzinfo is None and time_out.tzinfo is None:
+            norm_time_in, norm_time_out = time_in, time_out
+        else:
+            normalized_times = TimeManagementService._normalize_time_pair(time_in, time_out)
+            norm_time_in = normalized_times['time_in']
+            norm_time_out = normalized_times['time_out']
+        
+        # Check for negative duration (Edge Case)
+        raw_duration = norm_time_out - norm_time_in
+        seconds = raw_duration.total_seconds()
+        
+        corrections_applied = []
+        warnings = []
+        
+        # Handle negative duration
+        if seconds < 0:
+            corrections_applied.append("negative_duration_correction")
+            warnings.append(f"Negative duration detected: {raw_duration}. Applying correction.")
+            
+            # Try different correction strategies
+            norm_time_out = TimeManagementService._correct_negative_duration(
+                norm_time_in, norm_time_out, corrections_applied, warnings
+            )
+            raw_duration = norm_time_out - norm_time_in
+            seconds = raw_duration.total_seconds()
+        
+        total_seconds, total_minutes, hours, minutes, is_short, is_extreme = _duration_kernel(
+            raw_duration // _ONE_MICROSECOND, _MIN_DURATION_US, _MAX_DURATION_US
+        )
+        
+        # Check for extremely short duration
+        if is_short:
+            warnings.append(f"Very short duration detected: {seconds} seconds")
+        
+        # Check for extremely long duration
+        if is_extreme:
+            warnings.append(f"Extremely long duration detected: {seconds / 3600:.1f} hours")
+            corrections_applied.append("extreme_duration_flagged")
+        
+        # Handle midnight crossover
+        midnight_info = TimeManagementService._analyze_midnight_crossover(norm_time_in, norm_time_out)
+        if midnight_info['crosses_midnight']:
+            warnings.append("Session crosses midnight boundary")
+        
+        return {
+            'success': True,
+            'duration_seconds': total_seconds,
+            'duration_minutes': total_minutes,
+            'duration_hours': hours,
+            'duration_display_minutes': minutes,
+            'duration_formatted': (
+                _TWO_DIGITS[hours] + ':' + _TWO_DIGITS[minutes]
+                if 0 <= hours < 100 else f"{hours:02d}:{minutes:02d}"
+            ),
+            'time_in': norm_time_in,
+            'time_out': norm_time_out,
+            'crosses_midnight': midnight_info['crosses_midnight'],
+            'date_span_days': midnight_info['date_span_days'],
+            'corrections_applied': corrections_applied,
+            'warnings': warnings,
+            'is_reasonable_duration': not is_extreme
+        }
+    
     @staticmethod
     def _normalize_time_pair(time_in: datetime, time_out: datetime) -> Dict[str, datetime]:
         """Normalize a pair of times to handle timezone edge cases"""
@@ -129,10 +191,14 @@ class TimeManagementService:
             
             # Handle timezone-aware datetimes
             if time_in.tzinfo is not None:
-                norm_time_in = time_in.astimezone(pytz.UTC).replace(tzinfo=None)
+                if time_in.tzinfo is not _UTC:
+                    norm_time_in = time_in.astimezone(_UTC)
+                norm_time_in = norm_time_in.replace(tzinfo=None)
             
             if time_out.tzinfo is not None:
-                norm_time_out = time_out.astimezone(pytz.UTC).replace(tzinfo=None)
+                if time_out.tzinfo is not _UTC:
+                    norm_time_out = time_out.astimezone(_UTC)
+                norm_time_out = norm_time_out.replace(tzinfo=None)
             
             return {
                 'time_in': norm_time_in,
@@ -140,7 +206,7 @@ class TimeManagementService:
             }
             
         except Exception as e:
-            logger.error(f"Error normalizing time pair: {str(e)}")
+            logger.exception("Error normalizing time pair: %s", e)
             # Return original times if normalization fails
             return {
                 'time_in': time_in,
@@ -148,53 +214,50 @@ class TimeManagementService:
             }
     
     @staticmethod
-    def _correct_negative_duration(time_in: datetime, time_out: datetime) -> Dict[str, Any]:
-        """Correct negative duration using various strategies"""
-        corrections = []
-        warnings = []
-        corrected_time_out = time_out
-        
+    def _correct_negative_duration(time_in: datetime, time_out: datetime,
+                                   corrections: list, warnings: list) -> datetime:
+        """
+        Correct negative duration using various strategies
+        Returns the corrected time_out; the applied correction and its warning are
+        appended to the caller's corrections and warnings lists
+        """
         try:
+            delta_seconds = (time_in - time_out).total_seconds()
+            
             # Strategy 1: Check if times are swapped
-            if abs((time_in - time_out).total_seconds()) < (TimeManagementService.CLOCK_SYNC_TOLERANCE_MINUTES * 60):
+            if abs(delta_seconds) < _CLOCK_SYNC_TOLERANCE_SECONDS:
                 # Times are very close - likely clock sync issue
-                corrected_time_out = time_in + timedelta(minutes=TimeManagementService.MIN_REASONABLE_DURATION_MINUTES)
+                corrected_time_out = time_in + _MIN_DURATION
                 corrections.append("clock_sync_correction")
                 warnings.append("Applied clock synchronization correction")
             
             # Strategy 2: Check for day boundary issues
-            elif time_in.date() != time_out.date() and time_out < time_in:
+            elif time_in.toordinal() != time_out.toordinal() and time_out < time_in:
                 # Likely crossed midnight incorrectly
-                corrected_time_out = time_out + timedelta(days=1)
+                corrected_time_out = time_out + _ONE_DAY
                 corrections.append("midnight_boundary_correction")
                 warnings.append("Applied midnight boundary correction")
             
             # Strategy 3: Check for DST transition
             elif TimeManagementService._is_dst_transition_period(time_in, time_out):
                 # During DST transition, add an hour
-                corrected_time_out = time_out + timedelta(hours=1)
+                corrected_time_out = time_out + _ONE_HOUR
                 corrections.append("dst_transition_correction")
                 warnings.append("Applied DST transition correction")
             
             # Strategy 4: Default correction - set to minimum duration
             else:
-                corrected_time_out = time_in + timedelta(minutes=TimeManagementService.MIN_REASONABLE_DURATION_MINUTES)
+                corrected_time_out = time_in + _MIN_DURATION
                 corrections.append("minimum_duration_correction")
                 warnings.append("Applied minimum duration correction")
             
-            return {
-                'corrected_time_out': corrected_time_out,
-                'corrections': corrections,
-                'warnings': warnings
-            }
+            return corrected_time_out
             
         except Exception as e:
-            logger.error(f"Error correcting negative duration: {str(e)}")
-            return {
-                'corrected_time_out': time_in + timedelta(minutes=1),
-                'corrections': ['error_fallback_correction'],
-                'warnings': [f"Error during correction, applied fallback: {str(e)}"]
-            }
+            logger.exception("Error correcting negative duration: %s", e)
+            corrections.append('error_fallback_correction')
+            warnings.append(f"Error during correction, applied fallback: {str(e)}")
+            return time_in + timedelta(minutes=1)
     
     @staticmethod
     def _is_dst_transition_period(time_in: datetime, time_out: datetime) -> bool:
@@ -202,21 +265,22 @@ class TimeManagementService:
         try:
             # For simplicity, check if we're in March (spring forward) or November (fall back)
             # This is a simplified check - real implementation would need timezone-specific logic
-            transition_months = [3, 11]  # March and November for most regions
-            
-            return (time_in.month in transition_months or 
-                    time_out.month in transition_months)
+            return (time_in.month in _DST_TRANSITION_MONTHS or 
+                    time_out.month in _DST_TRANSITION_MONTHS)
             
         except Exception as e:
-            logger.error(f"Error checking DST transition: {str(e)}")
+            logger.exception("Error checking DST transition: %s", e)
             return False
     
     @staticmethod
     def _analyze_midnight_crossover(time_in: datetime, time_out: datetime) -> Dict[str, Any]:
         """Analyze if session crosses midnight and handle edge cases"""
         try:
-            crosses_midnight = time_in.date() != time_out.date()
-            date_span_days = (time_out.date() - time_in.date()).days + 1
+            # Day ordinals are plain ints; no date objects needed for the comparison
+            day_in = time_in.toordinal()
+            day_out = time_out.toordinal()
+            crosses_midnight = day_in != day_out
+            date_span_days = day_out - day_in + 1
             
             # Additional analysis for complex midnight scenarios
             analysis = {
@@ -234,7 +298,7 @@ class TimeManagementService:
             return analysis
             
         except Exception as e:
-            logger.error(f"Error analyzing midnight crossover: {str(e)}")
+            logger.exception("Error analyzing midnight crossover: %s", e)
             return {
                 'crosses_midnight': False,
                 'date_span_days': 1,
@@ -281,7 +345,7 @@ class TimeManagementService:
             return validation_result
             
         except Exception as e:
-            logger.error(f"Error validating session times: {str(e)}")
+            logger.exception("Error validating session times: %s", e)
             return {
                 'valid': False,
                 'errors': [f"Validation error: {str(e)}"],
@@ -299,26 +363,20 @@ class TimeManagementService:
             norm_arrival = normalized['time_out']
             
             # Calculate grace period end
-            grace_period_end = norm_start + timedelta(minutes=grace_period_minutes)
-            
-            # Calculate lateness
-            is_late = norm_arrival > grace_period_end
-            lateness_minutes = 0
+            grace_period_end = norm_start + _grace_period(grace_period_minutes)
             
-            if is_late:
-                lateness_duration = norm_arrival - grace_period_end
-                lateness_minutes = int(lateness_duration.total_seconds() / 60)
+            # Calculate lateness (exact integer microseconds, no float division)
+            grace_offset_us = (norm_arrival - grace_period_end) // _ONE_MICROSECOND
+            is_late = grace_offset_us > 0
+            lateness_minutes = grace_offset_us // _MICROSECONDS_PER_MINUTE if is_late else 0
             
             # Edge case: Arrival before session start
-            early_arrival = False
-            early_minutes = 0
-            if norm_arrival < norm_start:
-                early_arrival = True
-                early_duration = norm_start - norm_arrival
-                early_minutes = int(early_duration.total_seconds() / 60)
+            start_offset_us = (norm_start - norm_arrival) // _ONE_MICROSECOND
+            early_arrival = start_offset_us > 0
+            early_minutes = start_offset_us // _MICROSECONDS_PER_MINUTE if early_arrival else 0
             
             # Grace period boundary analysis
-            at_grace_boundary = abs((norm_arrival - grace_period_end).total_seconds()) <= 30  # Within 30 seconds
+            at_grace_boundary = abs(grace_offset_us) <= 30 * 1000000  # Within 30 seconds
             
             return {
                 'is_late': is_late,
@@ -333,7 +391,7 @@ class TimeManagementService:
             }
             
         except Exception as e:
-            logger.error(f"Error calculating late arrival: {str(e)}")
+            logger.exception("Error calculating late arrival: %s", e)
             return {
                 'is_late': False,
                 'is_early': False,
@@ -349,38 +407,41 @@ class TimeManagementService:
             if len(times_list) < 2:
                 return {'has_issues': False, 'message': 'Insufficient data for analysis'}
             
-            # Sort times
-            sorted_times = sorted(times_list)
+            # Sort times (as int64 epoch microseconds, so the sort runs in C rather than
+            # comparing datetime objects; gap detection still needs sorted order)
+            sorted_us = np.sort(_as_datetime64(times_list).view(np.int64))
             
             issues = []
             
-            # Check for times that are too close together (rapid scans)
-            for i in range(1, len(sorted_times)):
-                time_diff = (sorted_times[i] - sorted_times[i-1]).total_seconds()
-                if time_diff < 1:  # Less than 1 second apart
-                    issues.append(f"Extremely rapid scans detected: {time_diff} seconds apart")
+            # Consecutive gaps in seconds, computed in one pass
+            time_diffs = np.diff(sorted_us) / 1e6
             
-            # Check for large gaps that might indicate clock issues
-            for i in range(1, len(sorted_times)):
-                time_diff = (sorted_times[i] - sorted_times[i-1]).total_seconds()
-                if time_diff > 3600:  # More than 1 hour gap
+            # Check for times that are too close together (rapid scans, less than 1 second
+            # apart) and for large gaps that might indicate clock issues (more than 1 hour),
+            # in one pass over the flagged gaps in chronological order
+            flagged = (time_diffs < 1) | (time_diffs > 3600)
+            for time_diff in time_diffs[flagged].tolist():
+                if time_diff < 1:
+                    issues.append(f"Extremely rapid scans detected: {time_diff} seconds apart")
+                else:
                     issues.append(f"Large time gap detected: {time_diff/3600:.1f} hours")
             
             # Check for future times (compared to now)
-            now = datetime.utcnow()
-            future_times = [t for t in times_list if t > now + timedelta(minutes=5)]
-            if future_times:
-                issues.append(f"Future timestamps detected: {len(future_times)} times in the future")
+            # (epoch microseconds straight from the clock, same scale as sorted_us)
+            threshold_us = int((time.time() + 5 * 60) * 1e6)
+            future_count = int(np.count_nonzero(sorted_us > threshold_us))
+            if future_count:
+                issues.append(f"Future timestamps detected: {future_count} times in the future")
             
             return {
                 'has_issues': len(issues) > 0,
                 'issues': issues,
                 'analyzed_count': len(times_list),
-                'time_span_hours': (max(times_list) - min(times_list)).total_seconds() / 3600
+                'time_span_hours': int(sorted_us[-1] - sorted_us[0]) / 1e6 / 3600
             }
             
         except Exception as e:
-            logger.error(f"Error detecting clock sync issues: {str(e)}")
+            logger.exception("Error detecting clock sync issues: %s", e)
             return {
                 'has_issues': True,
                 'issues': [f"Analysis error: {str(e)}"],
@@ -391,26 +452,56 @@ class TimeManagementService:
     def get_current_time_info() -> Dict[str, Any]:
         """Get comprehensive current time information for debugging"""
         try:
-            now_utc = datetime.utcnow()
-            now_local = datetime.now()
+            # Read the clock once so the UTC and local views describe the same instant
+            now_ts = time.time()
+            now_utc = datetime.fromtimestamp(now_ts, _UTC).replace(tzinfo=None)
+            # One localtime() call gives the offset, DST flag and zone name
+            local = time.localtime(now_ts)
+            now_local = now_utc + timedelta(seconds=local.tm_gmtoff)
             
             return {
                 'utc_time': now_utc.isoformat(),
                 'local_time': now_local.isoformat(),
-                'timezone_offset_hours': (now_local - now_utc).total_seconds() / 3600,
-                'is_dst': time.daylight and time.localtime().tm_isdst,
-                'system_timezone': str(now_local.astimezone().tzinfo),
-                'timestamp_unix': now_utc.timestamp()
+                'timezone_offset_hours': local.tm_gmtoff / 3600,
+                'is_dst': time.daylight and local.tm_isdst,
+                'system_timezone': local.tm_zone,
+                'timestamp_unix': now_ts
             }
             
         except Exception as e:
-            logger.error(f"Error getting time info: {str(e)}")
+            logger.exception("Error getting time info: %s", e)
             return {
                 'error': str(e),
                 'utc_time': datetime.utcnow().isoformat()
             }
 
 
+# Duration thresholds in microseconds, derived once from the configuration above
+_MIN_DURATION_US = TimeManagementService.MIN_REASONABLE_DURATION_MINUTES * 60 * 1000000
+_MAX_DURATION_US = TimeManagementService.MAX_REASONABLE_DURATION_HOURS * 3600 * 1000000
+
+# Negative-duration correction offsets and tolerance
+_MIN_DURATION = timedelta(minutes=TimeManagementService.MIN_REASONABLE_DURATION_MINUTES)
+_CLOCK_SYNC_TOLERANCE_SECONDS = TimeManagementService.CLOCK_SYNC_TOLERANCE_MINUTES * 60
+_ONE_DAY = timedelta(days=1)
+_ONE_HOUR = timedelta(hours=1)
+
+
+# Room overlap query for validate_session_scheduling, built once with bind parameters
+# (room_id, start_time, end_time) so every call reuses its cached compiled SQL
+_OVERLAP_STMT = select(AttendanceSession).where(
+    AttendanceSession.room_id == bindparam('room_id'),
+    AttendanceSession.is_active == True,
+    # Standard interval overlap: covers starting/ending inside and either
+    # session containing the other
+    AttendanceSession.start_time < bindparam('end_time'),
+    AttendanceSession.end_time > bindparam('start_time')
+)
+
+# Same query excluding the session being edited (session_id)
+_OVERLAP_EXCLUDING_STMT = _OVERLAP_STMT.where(AttendanceSession.id != bindparam('session_id'))
+
+
 class SessionTimeValidator:
     """Specialized validator for session time management"""
     
@@ -419,8 +510,6 @@ class SessionTimeValidator:
                                   session_id: Optional[int] = None) -> Dict[str, Any]:
         """Validate session scheduling for conflicts and edge cases"""
         try:
-            from app.models.attendance_model import AttendanceSession
-            
             validation_result = {
                 'valid': True,
                 'conflicts': [],
@@ -435,38 +524,12 @@ class SessionTimeValidator:
             validation_result['warnings'].extend(basic_validation['warnings'])
             
             # Check for overlapping sessions in the same room
-            overlap_query = AttendanceSession.query.filter(
-                AttendanceSession.room_id == room_id,
-                AttendanceSession.is_active == True,
-                or_(
-                    # New session starts during existing session
-                    and_(
-                        AttendanceSession.start_time <= start_time,
-                        AttendanceSession.end_time > start_time
-                    ),
-                    # New session ends during existing session  
-                    and_(
-                        AttendanceSession.start_time < end_time,
-                        AttendanceSession.end_time >= end_time
-                    ),
-                    # New session completely contains existing session
-                    and_(
-                        AttendanceSession.start_time >= start_time,
-                        AttendanceSession.end_time <= end_time
-                    ),
-                    # Existing session completely contains new session
-                    and_(
-                        AttendanceSession.start_time <= start_time,
-                        AttendanceSession.end_time >= end_time
-                    )
-                )
-            )
-            
-            # Exclude current session if editing
+            # (excluding the current session if editing)
+            params = {'room_id': room_id, 'start_time': start_time, 'end_time': end_time}
             if session_id:
-                overlap_query = overlap_query.filter(AttendanceSession.id != session_id)
-            
-            conflicting_sessions = overlap_query.all()
+                params['session_id'] = session_id
+            overlap_stmt = _OVERLAP_EXCLUDING_STMT if session_id else _OVERLAP_STMT
+            conflicting_sessions = db.session.execute(overlap_stmt, params).scalars().all()
             
             if conflicting_sessions:
                 validation_result['valid'] = False
@@ -479,9 +542,9 @@ class SessionTimeValidator:
             return validation_result
             
         except Exception as e:
-            logger.error(f"Error validating session scheduling: {str(e)}")
+            logger.exception("Error validating session scheduling: %s", e)
             return {
                 'valid': False,
                 'conflicts': [f"Validation error: {str(e)}"],
                 'warnings': []
-            }
\ No newline at end of file
+            }
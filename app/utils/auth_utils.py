@@ -5,12 +5,23 @@ Handles password hashing, validation, and user authentication helpers
 
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import current_user
-from functools import wraps
+from functools import lru_cache, wraps
 from flask import redirect, url_for, flash, request
 import re
 import secrets
 import string
 
+# Validation patterns compiled once at import
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]+$')
+_STUDENT_NO_RE = re.compile(r'^[A-Za-z0-9\-_]+$')
+
+# Characters accepted as the password's special character
+_SPECIALS = frozenset('!@#$%^&*()_+-=[]{};:"\\|,.<>?')
+
+# Characters drawn by generate_random_password
+_PASSWORD_ALPHABET = tuple(string.ascii_letters + string.digits + "!@#$%^&*")
+
 def hash_password(password):
     """
     Hash password using Werkzeug's secure method
@@ -21,6 +32,15 @@ def hash_password(password):
     """
     return generate_password_hash(password, method='pbkdf2:sha256', salt_length=8)
 
+@lru_cache(maxsize=None)
+def _dummy_password_hash():
+    """
+    Stand-in hash verified when a user or stored hash is missing, so the check
+    costs a full hash at the default work factor. Built on first use rather
+    than at import, since that costs one full hash run.
+    """
+    return generate_password_hash(secrets.token_hex(16), method='pbkdf2:sha256', salt_length=8)
+
 def verify_password(password_hash, password):
     """
     Verify password against hash
@@ -30,6 +50,11 @@ def verify_password(password_hash, password):
     Returns:
         bool: True if password matches
     """
+    if not password_hash or password_hash.count('$') != 2:
+        # Missing or malformed hash: still run a full check so the response
+        # takes as long as a wrong password would
+        check_password_hash(_dummy_password_hash(), password or '')
+        return False
     return check_password_hash(password_hash, password)
 
 def validate_email(email):
@@ -40,8 +65,7 @@ def validate_email(email):
     Returns:
         bool: True if email is valid
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def validate_username(username):
     """
@@ -55,8 +79,7 @@ def validate_username(username):
     if not username or len(username) < 3 or len(username) > 20:
         return False
     
-    pattern = r'^[a-zA-Z0-9_]+$'
-    return re.match(pattern, username) is not None
+    return _USERNAME_RE.match(username) is not None
 
 def validate_password(password):
     """
@@ -78,16 +101,32 @@ def validate_password(password):
     if len(password) > 128:
         errors.append("Password must be less than 128 characters")
     
-    if not re.search(r'[A-Z]', password):
+    # Classify characters in one pass, stopping once every class is seen
+    has_upper = has_lower = has_digit = has_special = False
+    for ch in password:
+        if 'A' <= ch <= 'Z':
+            has_upper = True
+        elif 'a' <= ch <= 'z':
+            has_lower = True
+        elif ch.isdecimal():
+            has_digit = True
+        elif ch in _SPECIALS:
+            has_special = True
+        else:
+            continue
+        if has_upper and has_lower and has_digit and has_special:
+            break
+    
+    if not has_upper:
         errors.append("Password must contain at least one uppercase letter")
     
-    if not re.search(r'[a-z]', password):
+    if not has_lower:
         errors.append("Password must contain at least one lowercase letter")
     
-    if not re.search(r'\d', password):
+    if not has_digit:
         errors.append("Password must contain at least one number")
     
-    if not re.search(r'[!@#$%^&*()_+\-=\[\]{};:"\\|,.<>\?]', password):
+    if not has_special:
         errors.append("Password must contain at least one special character")
     
     return {
@@ -103,9 +142,7 @@ def generate_random_password(length=12):
     Returns:
         str: Random password
     """
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    password = ''.join(secrets.choice(characters) for _ in range(length))
-    return password
+    return ''.join([secrets.choice(_PASSWORD_ALPHABET) for _ in range(length)])
 
 def requires_role(allowed_roles):
     """
@@ -148,6 +185,34 @@ def requires_scanner_access(f):
     """
     return requires_role(['admin', 'professor', 'student'])(f)
 
+# Permission sets depend only on the role, so they are built once at import
+_PERMISSION_KEYS = (
+    'can_view_reports',
+    'can_manage_students',
+    'can_manage_rooms',
+    'can_manage_users',
+    'can_manage_sessions',
+    'can_export_data',
+    'can_view_dashboard'
+)
+_ANONYMOUS_PERMISSIONS = dict.fromkeys(_PERMISSION_KEYS, False)
+
+# Base permissions for all authenticated users
+_AUTHENTICATED_PERMISSIONS = dict(_ANONYMOUS_PERMISSIONS, can_view_dashboard=True)
+
+_PROFESSOR_PERMISSIONS = dict(
+    _AUTHENTICATED_PERMISSIONS,
+    can_view_reports=True,
+    can_manage_students=True,
+    can_manage_sessions=True,
+    can_export_data=True
+)
+
+_PERMISSIONS_BY_ROLE = {
+    'professor': _PROFESSOR_PERMISSIONS,
+    'admin': dict(_PROFESSOR_PERMISSIONS, can_manage_rooms=True, can_manage_users=True)
+}
+
 def get_user_permissions(user):
     """
     Get user permissions based on role
@@ -156,33 +221,19 @@ def get_user_permissions(user):
     Returns:
         dict: Dictionary of permissions
     """
-    permissions = {
-        'can_view_reports': False,
-        'can_manage_students': False,
-        'can_manage_rooms': False,
-        'can_manage_users': False,
-        'can_manage_sessions': False,
-        'can_export_data': False,
-        'can_view_dashboard': False
-    }
-    
     if not user or not user.is_authenticated:
-        return permissions
-    
-    # Base permissions for all authenticated users
-    permissions['can_view_dashboard'] = True
-    
-    if user.role in ['professor', 'admin']:
-        permissions['can_view_reports'] = True
-        permissions['can_manage_students'] = True
-        permissions['can_manage_sessions'] = True
-        permissions['can_export_data'] = True
+        return _ANONYMOUS_PERMISSIONS.copy()
     
-    if user.role == 'admin':
-        permissions['can_manage_rooms'] = True
-        permissions['can_manage_users'] = True
-    
-    return permissions
+    return _PERMISSIONS_BY_ROLE.get(user.role, _AUTHENTICATED_PERMISSIONS).copy()
+
+# Required fields for student/room validation and their error messages
+_STUDENT_REQUIRED = ('student_no', 'first_name', 'last_name', 'email', 'department', 'section', 'year_level')
+_STUDENT_EDIT_REQUIRED = _STUDENT_REQUIRED[1:]
+_ROOM_REQUIRED = ('room_number', 'building', 'floor', 'capacity')
+_REQUIRED_MESSAGES = {
+    field: f"{field.replace('_', ' ').title()} is required"
+    for field in _STUDENT_REQUIRED + _ROOM_REQUIRED
+}
 
 def validate_student_data(data):
     """
@@ -194,11 +245,9 @@ def validate_student_data(data):
     """
     errors = []
     
-    required_fields = ['student_no', 'first_name', 'last_name', 'email', 'department', 'section', 'year_level']
-    
-    for field in required_fields:
+    for field in _STUDENT_REQUIRED:
         if not data.get(field):
-            errors.append(f"{field.replace('_', ' ').title()} is required")
+            errors.append(_REQUIRED_MESSAGES[field])
     
     # Validate email
     if data.get('email') and not validate_email(data['email']):
@@ -214,13 +263,14 @@ def validate_student_data(data):
             errors.append("Year level must be a number")
     
     # Validate student number format
-    if data.get('student_no'):
-        student_no = data['student_no'].strip()
-        if len(student_no) < 6 or len(student_no) > 20:
+    student_no = data.get('student_no')
+    if student_no:
+        student_no = student_no.strip()
+        if not 6 <= len(student_no) <= 20:
             errors.append("Student number must be between 6 and 20 characters")
         
-        # Check for alphanumeric format
-        if not re.match(r'^[A-Za-z0-9\-_]+$', student_no):
+        # Check for alphanumeric format (only once the cheap length check passes)
+        elif not _STUDENT_NO_RE.match(student_no):
             errors.append("Student number can only contain letters, numbers, hyphens, and underscores")
     
     return {
@@ -239,11 +289,9 @@ def validate_student_edit_data(data):
     errors = []
     
     # Required fields for editing (no student_no)
-    required_fields = ['first_name', 'last_name', 'email', 'department', 'section', 'year_level']
-    
-    for field in required_fields:
+    for field in _STUDENT_EDIT_REQUIRED:
         if not data.get(field):
-            errors.append(f"{field.replace('_', ' ').title()} is required")
+            errors.append(_REQUIRED_MESSAGES[field])
     
     # Validate email
     if data.get('email') and not validate_email(data['email']):
@@ -274,11 +322,9 @@ def validate_room_data(data):
     errors = []
     
     # Required fields (matching the frontend form requirements)
-    required_fields = ['room_number', 'building', 'floor', 'capacity']
-    
-    for field in required_fields:
+    for field in _ROOM_REQUIRED:
         if not data.get(field):
-            errors.append(f"{field.replace('_', ' ').title()} is required")
+            errors.append(_REQUIRED_MESSAGES[field])
     
     # Room name is optional, but if provided should not be empty
     if data.get('room_name') is not None and data.get('room_name').strip() == '':
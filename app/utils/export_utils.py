@@ -3,27 +3,77 @@ Export Utilities for ScanMe System
 Handles data export to various formats (Excel, CSV, PDF)
 """
 
-import pandas as pd
 from datetime import datetime, date
 import os
+import time
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer, Image as RLImage
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import io
 import csv
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from operator import attrgetter
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+
+# strftime format for the timestamp in default export filenames
+_FILENAME_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+# PDF styles, built once at import and shared by every export
+_PDF_STYLES = getSampleStyleSheet()
+_PDF_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_PDF_STYLES['Heading1'],
+    fontSize=18,
+    spaceAfter=30,
+    alignment=1  # Center alignment
+)
+_PDF_DATE_STYLE = ParagraphStyle(
+    'DateStyle',
+    parent=_PDF_STYLES['Normal'],
+    fontSize=10,
+    alignment=1,
+    spaceAfter=20
+)
+_PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+_PDF_ABSENT_BACKGROUND = colors.Color(1, 0.89, 0.89)  # Light red
+_PDF_ABSENT_TEXT = colors.Color(0.6, 0.1, 0.1)  # Dark red
+_PDF_LATE_BACKGROUND = colors.Color(1, 0.95, 0.78)  # Light yellow
+_PDF_ON_TIME_BACKGROUND = colors.Color(0.82, 0.98, 0.9)  # Light green
+
+# Export directories, resolved once at import
+_EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'exports')
+_STUDENT_EXPORT_DIR = os.path.abspath('exports')
+
+# Directories already created by this process, so makedirs runs once per path
+_created_export_dirs = set()
+
+def _ensure_dir(path):
+    """Create an export directory on first use and return its path"""
+    if path not in _created_export_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_export_dirs.add(path)
+    return path
 
 # Get the base directory for exports
 def get_export_dir():
     """Get the absolute path to the exports directory"""
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    export_dir = os.path.join(base_dir, 'exports')
-    os.makedirs(export_dir, exist_ok=True)
-    return export_dir
+    return _ensure_dir(_EXPORT_DIR)
 
 def export_attendance_to_excel(attendance_data, filename=None):
     """
@@ -36,24 +86,43 @@ def export_attendance_to_excel(attendance_data, filename=None):
     """
     try:
         if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime(_FILENAME_TIMESTAMP_FORMAT)
             filename = f"attendance_report_{timestamp}.xlsx"
         
         # Ensure export directory exists
         export_dir = get_export_dir()
         output_path = os.path.join(export_dir, filename)
         
-        # Convert to DataFrame
-        df = pd.DataFrame(attendance_data)
-        
-        # Create Excel workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Attendance Report"
+        headers = list(attendance_data[0].keys()) if attendance_data else []
+        status_col_idx = headers.index('Attendance Status') if 'Attendance Status' in headers else None
+        
+        # Collect row values and column widths in one pass; write-only sheets
+        # need their widths before the first row is written
+        widths = [len(header) for header in headers]
+        rows = []
+        for record in attendance_data:
+            row = []
+            for i, header in enumerate(headers):
+                value = record.get(header)
+                # Empty cells (None) don't widen the column
+                if value is not None:
+                    length = len(str(value))
+                    if length > widths[i]:
+                        widths[i] = length
+                row.append(value)
+            rows.append(row)
+        
+        # Create write-only Excel workbook, streamed to disk on save
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Attendance Report")
+        
+        for i, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min((width + 2) * 1.2, 50)
         
         # Add header
         header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
         header_font = Font(color="FFFFFF", bold=True)
+        header_alignment = Alignment(horizontal="center")
         
         # Define styles for different attendance statuses
         absent_fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")  # Light red
@@ -65,57 +134,40 @@ def export_attendance_to_excel(attendance_data, filename=None):
         present_fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")  # Light green
         present_font = Font(color="065F46")  # Dark green
         
-        # Write data
-        for r_idx, r in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
-            ws.append(r)
-            
-            # Apply conditional formatting based on attendance status
-            if r_idx > 1:  # Skip header row
-                # Find the Attendance Status column
-                try:
-                    status_col_idx = list(df.columns).index('Attendance Status') + 1 if 'Attendance Status' in df.columns else None
-                    
-                    if status_col_idx:
-                        status_cell = ws.cell(row=r_idx, column=status_col_idx)
-                        status_value = str(status_cell.value) if status_cell.value else ""
-                        
-                        # Apply formatting to entire row based on status
-                        for col_idx in range(1, len(df.columns) + 1):
-                            cell = ws.cell(row=r_idx, column=col_idx)
-                            
-                            if 'Absent' in status_value:
-                                cell.fill = absent_fill
-                                if col_idx == status_col_idx:
-                                    cell.font = absent_font
-                            elif 'Late' in status_value:
-                                cell.fill = late_fill
-                                if col_idx == status_col_idx:
-                                    cell.font = late_font
-                            elif 'Present' in status_value and 'On-Time' in status_value:
-                                cell.fill = present_fill
-                                if col_idx == status_col_idx:
-                                    cell.font = present_font
-                except (ValueError, IndexError):
-                    pass  # Column not found, skip formatting
-        
-        # Format header
-        for cell in ws[1]:
+        header_row = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
             cell.fill = header_fill
             cell.font = header_font
-            cell.alignment = Alignment(horizontal="center")
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min((max_length + 2) * 1.2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
+            cell.alignment = header_alignment
+            header_row.append(cell)
+        ws.append(header_row)
+        
+        # Write data, formatting each row based on attendance status
+        for row in rows:
+            if status_col_idx is None:
+                ws.append(row)
+                continue
+            
+            status_value = str(row[status_col_idx]) if row[status_col_idx] else ""
+            if 'Absent' in status_value:
+                fill, status_font = absent_fill, absent_font
+            elif 'Late' in status_value:
+                fill, status_font = late_fill, late_font
+            elif 'Present' in status_value and 'On-Time' in status_value:
+                fill, status_font = present_fill, present_font
+            else:
+                ws.append(row)
+                continue
+            
+            styled_row = []
+            for col_idx, value in enumerate(row):
+                cell = WriteOnlyCell(ws, value=value)
+                cell.fill = fill
+                if col_idx == status_col_idx:
+                    cell.font = status_font
+                styled_row.append(cell)
+            ws.append(styled_row)
         
         # Save file
         wb.save(output_path)
@@ -139,7 +191,7 @@ def export_attendance_to_csv(attendance_data, filename=None):
     """
     try:
         if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime(_FILENAME_TIMESTAMP_FORMAT)
             filename = f"attendance_report_{timestamp}.csv"
         
         # Ensure export directory exists
@@ -149,13 +201,13 @@ def export_attendance_to_csv(attendance_data, filename=None):
         if not attendance_data:
             return None
         
-        # Write CSV file
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            if attendance_data:
-                fieldnames = attendance_data[0].keys()
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(attendance_data)
+        # Write CSV file; rows are produced lazily and consumed by csv.writer
+        headers = list(attendance_data[0].keys())
+        with open(output_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(headers)
+            writer.writerows([record.get(header, '') for header in headers]
+                             for record in attendance_data)
         
         return output_path
         
@@ -177,7 +229,7 @@ def export_attendance_to_pdf(attendance_data, title="Attendance Report", filenam
     """
     try:
         if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime(_FILENAME_TIMESTAMP_FORMAT)
             filename = f"attendance_report_{timestamp}.pdf"
         
         # Ensure export directory exists
@@ -188,29 +240,12 @@ def export_attendance_to_pdf(attendance_data, title="Attendance Report", filenam
         doc = SimpleDocTemplate(output_path, pagesize=A4)
         elements = []
         
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1  # Center alignment
-        )
-        
         # Add title
-        title_para = Paragraph(title, title_style)
+        title_para = Paragraph(title, _PDF_TITLE_STYLE)
         elements.append(title_para)
         
         # Add generation date
-        date_style = ParagraphStyle(
-            'DateStyle',
-            parent=styles['Normal'],
-            fontSize=10,
-            alignment=1,
-            spaceAfter=20
-        )
-        date_para = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", date_style)
+        date_para = Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", _PDF_DATE_STYLE)
         elements.append(date_para)
         
         if attendance_data:
@@ -221,36 +256,27 @@ def export_attendance_to_pdf(attendance_data, title="Attendance Report", filenam
             
             # Add summary
             summary_text = f"<b>Summary:</b> Total Records: {total_records} | Present: {present_count} | Absent (No Time-Out): {absent_count}"
-            summary_para = Paragraph(summary_text, styles['Normal'])
+            summary_para = Paragraph(summary_text, _PDF_STYLES['Normal'])
             elements.append(summary_para)
             elements.append(Spacer(1, 20))
             
             # Prepare table data
             headers = list(attendance_data[0].keys())
-            table_data = [headers]
             
             # Find Attendance Status column index
             status_col_idx = headers.index('Attendance Status') if 'Attendance Status' in headers else None
             
-            for record in attendance_data:
-                row = [str(record.get(header, '')) for header in headers]
-                table_data.append(row)
+            # Cell values are left as-is; ReportLab converts them to text when drawing
+            table_data = [headers]
+            table_data.extend([record.get(header, '') for header in headers] for record in attendance_data)
             
-            # Create table
-            table = Table(table_data)
+            # Create table; LongTable splits across pages cheaply and
+            # repeats the header row on each page
+            table = LongTable(table_data, repeatRows=1)
             
-            # Base table style
-            table_style = [
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]
+            # Base table style, then per-row status colors on top
+            table.setStyle(_PDF_TABLE_STYLE)
+            table_style = []
             
             # Add conditional row coloring based on attendance status
             if status_col_idx is not None:
@@ -259,20 +285,21 @@ def export_attendance_to_pdf(attendance_data, title="Attendance Report", filenam
                     
                     if 'Absent' in status:
                         # Light red background for absent students
-                        table_style.append(('BACKGROUND', (0, i), (-1, i), colors.Color(1, 0.89, 0.89)))
-                        table_style.append(('TEXTCOLOR', (status_col_idx, i), (status_col_idx, i), colors.Color(0.6, 0.1, 0.1)))
+                        table_style.append(('BACKGROUND', (0, i), (-1, i), _PDF_ABSENT_BACKGROUND))
+                        table_style.append(('TEXTCOLOR', (status_col_idx, i), (status_col_idx, i), _PDF_ABSENT_TEXT))
                     elif 'Late' in status:
                         # Light yellow background for late students
-                        table_style.append(('BACKGROUND', (0, i), (-1, i), colors.Color(1, 0.95, 0.78)))
+                        table_style.append(('BACKGROUND', (0, i), (-1, i), _PDF_LATE_BACKGROUND))
                     elif 'On-Time' in status:
                         # Light green background for on-time students
-                        table_style.append(('BACKGROUND', (0, i), (-1, i), colors.Color(0.82, 0.98, 0.9)))
+                        table_style.append(('BACKGROUND', (0, i), (-1, i), _PDF_ON_TIME_BACKGROUND))
             
-            table.setStyle(TableStyle(table_style))
+            if table_style:
+                table.setStyle(TableStyle(table_style))
             
             elements.append(table)
         else:
-            no_data_para = Paragraph("No attendance data found.", styles['Normal'])
+            no_data_para = Paragraph("No attendance data found.", _PDF_STYLES['Normal'])
             elements.append(no_data_para)
         
         # Build PDF
@@ -286,6 +313,66 @@ def export_attendance_to_pdf(attendance_data, title="Attendance Report", filenam
         traceback.print_exc()
         return None
 
+# Attribute getters for report records, used as sort keys and with map()
+_scan_time = attrgetter('scan_time')
+_room = attrgetter('room')
+
+def _attendance_status(time_out, is_late):
+    """Attendance status label for a report record"""
+    if time_out is None:
+        return 'Absent (No Time-Out)'
+    return 'Present (Late)' if is_late else 'Present (On-Time)'
+
+def _student_report_row(r):
+    """Build one 'records' entry of a student report"""
+    time_in, time_out, room, scanner = r.time_in, r.time_out, r.room, r.scanned_by_user
+    is_late = r.is_late
+    return {
+        'date': r.scan_time.date().isoformat(),
+        'time_in': time_in.time().isoformat() if time_in else 'N/A',
+        'time_out': time_out.time().isoformat() if time_out else 'No Time-Out',
+        'duration': r.get_duration() if time_out else 0,
+        'room': room.get_full_name() if room else 'Unknown',
+        'is_late': is_late,
+        'status': _attendance_status(time_out, is_late),
+        'scanner': scanner.username if scanner else 'System'
+    }
+
+def _room_report_row(r):
+    """Build one 'records' entry of a room report"""
+    time_in, time_out, student, scanner = r.time_in, r.time_out, r.student, r.scanned_by_user
+    is_late = r.is_late
+    return {
+        'date': r.scan_time.date().isoformat(),
+        'time_in': time_in.time().isoformat() if time_in else 'N/A',
+        'time_out': time_out.time().isoformat() if time_out else 'No Time-Out',
+        'duration': r.get_duration() if time_out else 0,
+        'student': student.get_full_name() if student else 'Unknown',
+        'student_no': student.student_no if student else 'N/A',
+        'is_late': is_late,
+        'status': _attendance_status(time_out, is_late),
+        'scanner': scanner.username if scanner else 'System'
+    }
+
+def _records_in_date_range(attendance_records, start_date=None, end_date=None):
+    """
+    Sort attendance records by scan time and keep those within the date range
+    Args:
+        attendance_records: List of attendance records
+        start_date: First date to include (optional)
+        end_date: Last date to include (optional)
+    Returns:
+        list: Records in the range, oldest first
+    """
+    records_sorted = sorted(attendance_records, key=_scan_time)
+    if not start_date and not end_date:
+        return records_sorted
+    
+    scan_dates = [r.scan_time.date() for r in records_sorted]
+    lo = bisect_left(scan_dates, start_date) if start_date else 0
+    hi = bisect_right(scan_dates, end_date) if end_date else len(scan_dates)
+    return records_sorted[lo:hi]
+
 def generate_student_report(student, attendance_records, start_date=None, end_date=None):
     """
     Generate individual student attendance report
@@ -298,27 +385,30 @@ def generate_student_report(student, attendance_records, start_date=None, end_da
         dict: Report data
     """
     try:
-        # Filter records by date range if provided
-        if start_date:
-            attendance_records = [r for r in attendance_records if r.scan_time.date() >= start_date]
-        if end_date:
-            attendance_records = [r for r in attendance_records if r.scan_time.date() <= end_date]
-        
-        # Calculate statistics
-        total_days = len(set(r.scan_time.date() for r in attendance_records))
-        total_scans = len(attendance_records)
-        late_arrivals = len([r for r in attendance_records if r.is_late])
-        absent_records = len([r for r in attendance_records if r.time_out is None])
-        complete_attendance = total_scans - absent_records
-        rooms_visited = len(set(r.room_id for r in attendance_records))
+        # Sort by scan time and slice out the date range
+        attendance_records = _records_in_date_range(attendance_records, start_date, end_date)
         
-        # Group by date
-        daily_attendance = {}
+        # Calculate statistics and group by date in a single pass;
+        # each day holds [records, late_count, incomplete_count]
+        total_scans = len(attendance_records)
+        late_arrivals = 0
+        absent_records = 0
+        room_ids = set()
+        daily_attendance = defaultdict(lambda: [[], 0, 0])
         for record in attendance_records:
-            date_key = record.scan_time.date()
-            if date_key not in daily_attendance:
-                daily_attendance[date_key] = []
-            daily_attendance[date_key].append(record)
+            day = daily_attendance[record.scan_time.date()]
+            day[0].append(record)
+            room_ids.add(record.room_id)
+            if record.is_late:
+                late_arrivals += 1
+                day[1] += 1
+            if record.time_out is None:
+                absent_records += 1
+                day[2] += 1
+        
+        total_days = len(daily_attendance)
+        complete_attendance = total_scans - absent_records
+        rooms_visited = len(room_ids)
         
         report_data = {
             'student_info': {
@@ -345,26 +435,15 @@ def generate_student_report(student, attendance_records, start_date=None, end_da
             'daily_breakdown': {
                 str(date): {
                     'scans': len(records),
-                    'rooms': [r.room.get_full_name() for r in records],
-                    'times': [r.scan_time.strftime('%H:%M:%S') for r in records],
-                    'late_count': len([r for r in records if r.is_late]),
-                    'incomplete_count': len([r for r in records if r.time_out is None])
+                    'rooms': [room.get_full_name() for room in map(_room, records)],
+                    'times': [scan_time.strftime('%H:%M:%S') for scan_time in map(_scan_time, records)],
+                    'late_count': late_count,
+                    'incomplete_count': incomplete_count
                 }
-                for date, records in daily_attendance.items()
+                for date, (records, late_count, incomplete_count) in daily_attendance.items()
             },
-            'records': [
-                {
-                    'date': r.scan_time.date().isoformat(),
-                    'time_in': r.time_in.time().isoformat() if r.time_in else 'N/A',
-                    'time_out': r.time_out.time().isoformat() if r.time_out else 'No Time-Out',
-                    'duration': r.get_duration() if r.time_out else 0,
-                    'room': r.room.get_full_name() if r.room else 'Unknown',
-                    'is_late': r.is_late,
-                    'status': 'Absent (No Time-Out)' if r.time_out is None else ('Present (Late)' if r.is_late else 'Present (On-Time)'),
-                    'scanner': r.scanned_by_user.username if r.scanned_by_user else 'System'
-                }
-                for r in sorted(attendance_records, key=lambda x: x.scan_time, reverse=True)
-            ]
+            # Records are already sorted oldest first; list them newest first
+            'records': [_student_report_row(r) for r in reversed(attendance_records)]
         }
         
         return report_data
@@ -385,43 +464,39 @@ def generate_room_report(room, attendance_records, start_date=None, end_date=Non
         dict: Report data
     """
     try:
-        # Filter records by date range if provided
-        if start_date:
-            attendance_records = [r for r in attendance_records if r.scan_time.date() >= start_date]
-        if end_date:
-            attendance_records = [r for r in attendance_records if r.scan_time.date() <= end_date]
+        # Sort by scan time and slice out the date range
+        attendance_records = _records_in_date_range(attendance_records, start_date, end_date)
         
-        # Calculate statistics
+        # Calculate statistics and group by date in a single pass
         total_scans = len(attendance_records)
-        unique_students = len(set(r.student_id for r in attendance_records))
-        unique_days = len(set(r.scan_time.date() for r in attendance_records))
-        late_arrivals = len([r for r in attendance_records if r.is_late])
-        incomplete_attendance = len([r for r in attendance_records if r.time_out is None])
-        complete_attendance = total_scans - incomplete_attendance
-        
-        # Group by date
-        daily_stats = {}
+        late_arrivals = 0
+        incomplete_attendance = 0
+        student_ids = set()
+        daily_stats = defaultdict(lambda: {
+            'students': set(),
+            'total_scans': 0,
+            'late_count': 0,
+            'incomplete_count': 0
+        })
         for record in attendance_records:
-            date_key = record.scan_time.date()
-            if date_key not in daily_stats:
-                daily_stats[date_key] = {
-                    'students': set(),
-                    'total_scans': 0,
-                    'late_count': 0,
-                    'incomplete_count': 0
-                }
-            
-            daily_stats[date_key]['students'].add(record.student_id)
-            daily_stats[date_key]['total_scans'] += 1
+            stats = daily_stats[record.scan_time.date()]
+            stats['students'].add(record.student_id)
+            stats['total_scans'] += 1
+            student_ids.add(record.student_id)
             if record.is_late:
-                daily_stats[date_key]['late_count'] += 1
+                late_arrivals += 1
+                stats['late_count'] += 1
             if record.time_out is None:
-                daily_stats[date_key]['incomplete_count'] += 1
+                incomplete_attendance += 1
+                stats['incomplete_count'] += 1
+        
+        unique_students = len(student_ids)
+        unique_days = len(daily_stats)
+        complete_attendance = total_scans - incomplete_attendance
         
         # Convert sets to counts
-        for date, stats in daily_stats.items():
-            stats['unique_students'] = len(stats['students'])
-            del stats['students']
+        for stats in daily_stats.values():
+            stats['unique_students'] = len(stats.pop('students'))
         
         report_data = {
             'room_info': {
@@ -449,20 +524,8 @@ def generate_room_report(room, attendance_records, start_date=None, end_date=Non
             'daily_breakdown': {
                 str(date): stats for date, stats in daily_stats.items()
             },
-            'records': [
-                {
-                    'date': r.scan_time.date().isoformat(),
-                    'time_in': r.time_in.time().isoformat() if r.time_in else 'N/A',
-                    'time_out': r.time_out.time().isoformat() if r.time_out else 'No Time-Out',
-                    'duration': r.get_duration() if r.time_out else 0,
-                    'student': r.student.get_full_name() if r.student else 'Unknown',
-                    'student_no': r.student.student_no if r.student else 'N/A',
-                    'is_late': r.is_late,
-                    'status': 'Absent (No Time-Out)' if r.time_out is None else ('Present (Late)' if r.is_late else 'Present (On-Time)'),
-                    'scanner': r.scanned_by_user.username if r.scanned_by_user else 'System'
-                }
-                for r in sorted(attendance_records, key=lambda x: x.scan_time, reverse=True)
-            ]
+            # Records are already sorted oldest first; list them newest first
+            'records': [_room_report_row(r) for r in reversed(attendance_records)]
         }
         
         return report_data
@@ -482,44 +545,55 @@ def export_students_to_excel(students_data, filename=None):
     """
     try:
         if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime(_FILENAME_TIMESTAMP_FORMAT)
             filename = f"students_list_{timestamp}.xlsx"
         
-        output_path = os.path.join('exports', filename)
-        os.makedirs('exports', exist_ok=True)
+        output_path = os.path.join(_ensure_dir(_STUDENT_EXPORT_DIR), filename)
+        
+        # Columns in order of first appearance across all students
+        headers = list(dict.fromkeys(key for student in students_data for key in student))
+        
+        # Collect row values and column widths in one pass; write-only sheets
+        # need their widths before the first row is written
+        widths = [len(str(header)) for header in headers]
+        rows = []
+        for student in students_data:
+            row = []
+            for i, header in enumerate(headers):
+                value = student.get(header)
+                # Empty cells (None) don't widen the column
+                if value is not None:
+                    length = len(str(value))
+                    if length > widths[i]:
+                        widths[i] = length
+                row.append(value)
+            rows.append(row)
+        
+        # Create write-only Excel workbook, streamed to disk on save
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Students")
+        
+        for i, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = min((width + 2) * 1.2, 50)
         
-        # Convert to DataFrame
-        df = pd.DataFrame(students_data)
+        # Format header
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_font = Font(color="FFFFFF", bold=True)
+        header_alignment = Alignment(horizontal="center")
         
-        # Write to Excel with formatting
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Students')
-            
-            # Get workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Students']
-            
-            # Format header
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_font = Font(color="FFFFFF", bold=True)
-            
-            for cell in worksheet[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal="center")
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min((max_length + 2) * 1.2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
+        header_row = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.alignment = header_alignment
+            header_row.append(cell)
+        ws.append(header_row)
+        
+        for row in rows:
+            ws.append(row)
+        
+        wb.save(output_path)
         
         return output_path
         
@@ -9,15 +9,211 @@ import io
 import base64
 import os
 import json
+import multiprocessing
 import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from json.encoder import encode_basestring
 
 try:
     import numpy as np
 except ImportError:
     np = None
 
-def generate_user_qr_code(user_data, user_type='student', save_path=None, return_bytes=False):
+# segno builds the QR matrix with integer bit buffers and writes a compact
+# 1-bit PNG directly; qrcode (pure Python, via PIL) is the fallback
+try:
+    import segno
+except ImportError:
+    segno = None
+
+# pybase64 (SIMD libbase64) returns the base64 text directly as str
+try:
+    from pybase64 import b64encode_as_string as _b64encode_str
+except ImportError:
+    def _b64encode_str(data):
+        return base64.b64encode(data).decode('ascii')
+
+# orjson encodes/parses QR payloads several times faster; its decode errors
+# subclass json.JSONDecodeError. Both paths emit compact, non-ASCII-escaped JSON.
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(payload):
+        return orjson.dumps(payload).decode('utf-8')
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+    def _json_dumps(payload):
+        return json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+
+# Injection markers rejected by validate_qr_data, each list compiled into one
+# case-insensitive alternation so a payload is scanned once per category
+# without building a lowercased copy
+_DANGEROUS_PATTERNS = (
+    '<script', '</script>', '<iframe', '<object', '<embed',
+    'javascript:', 'vbscript:', 'onload=', 'onerror=', 'onclick='
+)
+_SQL_PATTERNS = (
+    "'; drop table", "'; delete from", "union select",
+    "' or '1'='1", "' or 1=1", "--", "/*", "*/"
+)
+_DANGEROUS_PATTERN_RE = re.compile('|'.join(map(re.escape, _DANGEROUS_PATTERNS)), re.IGNORECASE)
+_SQL_PATTERN_RE = re.compile('|'.join(map(re.escape, _SQL_PATTERNS)), re.IGNORECASE)
+
+# Student payloads have a fixed key order, so without orjson they are filled
+# into a template (values quoted by the C string encoder) rather than going
+# through the pure-Python json encoder
+_STUDENT_QR_TEMPLATE = (
+    '{{"type":"student_attendance","student_id":{},"student_no":{},"name":{},'
+    '"department":{},"section":{},"year_level":{},"generated_at":{},"version":"1.0"}}'
+)
+
+# Student identifiers: alphanumerics (any script, as str.isalnum() accepts)
+# plus '-' and '_', with at least one alphanumeric. The legacy pattern also
+# bounds the length, so a valid plain student number is accepted after a
+# single match.
+_STUDENT_ID_RE = re.compile(r'\A(?=[-_]*[^\W_])[\w-]+\Z')
+_LEGACY_RE = re.compile(r'\A(?=[-_]*[^\W_])[\w-]{1,20}\Z')
+
+# Rendered PNGs for stable (date-stamped) payloads, keyed by payload, least
+# recently used first. Timestamped payloads are unique per call, so they are
+# never cached. Kept in the calling process: bulk generation checks it before
+# handing work to the pool.
+_QR_PNG_CACHE_SIZE = 4096
+_qr_png_cache = OrderedDict()
+_qr_png_cache_lock = threading.Lock()
+
+# Bulk QR codes render in a shared process pool only for batches this large:
+# one code takes ~12 ms, while starting the workers (each imports the app)
+# takes ~0.8 s, which parallel rendering only wins back beyond ~100 codes
+_BULK_QR_PARALLEL_MIN = 128
+_BULK_QR_MAX_WORKERS = 4
+
+# Created on first use. Workers come from a forkserver (spawn where that is
+# unavailable) rather than a fork of the calling, already threaded, process.
+_bulk_qr_pool = None
+_bulk_qr_pool_lock = threading.Lock()
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Per-thread cv2.QRCodeDetector instances (construction is not free, sharing is not safe)
+_thread_local = threading.local()
+
+def _is_utf8_encodable(text):
+    """Check that a string has no lone surrogates, i.e. encodes as UTF-8"""
+    # ASCII text always encodes; skip building the encoded copy
+    if text.isascii():
+        return True
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+def _render_qr_png(qr_data):
+    """PNG bytes for QR code data (uncached; also runs in bulk worker processes)"""
+    buffer = io.BytesIO()
+    _write_qr_png(qr_data, buffer)
+    return buffer.getvalue()
+
+def _cached_qr_png(qr_data):
+    """Cached PNG bytes for QR code data, or None"""
+    with _qr_png_cache_lock:
+        png_bytes = _qr_png_cache.get(qr_data)
+        if png_bytes is not None:
+            _qr_png_cache.move_to_end(qr_data)
+        return png_bytes
+
+def _remember_qr_png(qr_data, png_bytes):
+    """Cache PNG bytes for QR code data, evicting the least recently used"""
+    with _qr_png_cache_lock:
+        _qr_png_cache[qr_data] = png_bytes
+        _qr_png_cache.move_to_end(qr_data)
+        if len(_qr_png_cache) > _QR_PNG_CACHE_SIZE:
+            _qr_png_cache.popitem(last=False)
+
+def _render_qr_png_bytes(qr_data, cache=False):
+    """PNG bytes for QR code data, memoized by payload when cache is set"""
+    if not cache:
+        return _render_qr_png(qr_data)
+    
+    png_bytes = _cached_qr_png(qr_data)
+    if png_bytes is None:
+        png_bytes = _render_qr_png(qr_data)
+        _remember_qr_png(qr_data, png_bytes)
+    return png_bytes
+
+def _write_qr_png(qr_data, target):
+    """
+    Render QR code data as a PNG image
+    Args:
+        qr_data (str): Content to encode
+        target: Binary file object to write the PNG to
+    """
+    if segno is not None:
+        # make_qr never picks a Micro QR; UTF-8 matches what qrcode emits
+        qr = segno.make_qr(qr_data, error='m', boost_error=False, encoding='utf-8')
+        qr.save(target, kind='png', scale=10, border=4)
+        return
+    
+    # Configure QR code
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    
+    if np is not None:
+        target.write(_qr_matrix_png(qr.get_matrix(), qr.box_size))
+        return
+    
+    # Create image
+    img = qr.make_image(fill_color="black", back_color="white")
+    img.save(target, format='PNG')
+
+def _png_chunk(chunk_type, data):
+    """Length-prefixed, CRC-suffixed PNG chunk"""
+    return (struct.pack('>I', len(data)) + chunk_type + data
+            + struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+def _qr_matrix_png(matrix, scale):
+    """
+    Encode a QR module matrix as a 1-bit grayscale PNG, like segno does,
+    instead of building and re-encoding an 8-bit PIL image
+    Args:
+        matrix (list): Rows of booleans (True = dark module), border included
+        scale (int): Pixels per module
+    Returns:
+        bytes: PNG file contents
+    """
+    # In 1-bit grayscale a set bit is white, so invert the dark modules
+    pixels = ~np.asarray(matrix, dtype=bool).repeat(scale, axis=0).repeat(scale, axis=1)
+    height, width = pixels.shape
+    rows = np.packbits(pixels, axis=1)
+    # Each scanline starts with filter type 0 (None)
+    scanlines = np.hstack((np.zeros((height, 1), dtype=np.uint8), rows))
+    header = struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0)
+    return b''.join((
+        _PNG_SIGNATURE,
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(scanlines.tobytes())),
+        _png_chunk(b'IEND', b''),
+    ))
+
+def generate_user_qr_code(user_data, user_type='student', save_path=None, return_bytes=False,
+                          stable=False):
     """
     Generate QR code for any user type (student, professor, admin)
     Args:
@@ -25,73 +221,65 @@ def generate_user_qr_code(user_data, user_type='student', save_path=None, return
         user_type (str): Type of user (student, professor, admin)
         save_path (str): Path to save QR code image
         return_bytes (bool): Return as bytes instead of saving
+        stable (bool): Stamp the payload with the date only, so repeat
+            generations on the same day reuse the cached image
     Returns:
         str or bytes: File path or image bytes
     """
     try:
         # Create QR code data
-        qr_data = create_qr_data(user_data, user_type)
-        
-        # Configure QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4,
-        )
-        
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
+        qr_data = create_qr_data(user_data, user_type, stable=stable)
+        png_bytes = _render_qr_png_bytes(qr_data, cache=stable)
         
         if return_bytes:
             # Return as bytes
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
-            return img_byte_arr.getvalue()
+            return png_bytes
         
         if save_path:
             # Ensure directory exists
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            img.save(save_path)
+            with open(save_path, 'wb') as f:
+                f.write(png_bytes)
             return save_path
         
         # Return as base64 string
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
+        img_base64 = _b64encode_str(png_bytes)
         return img_base64
         
     except Exception as e:
         print(f"Error generating QR code: {str(e)}")
         return None
 
-def generate_student_qr_code(student_data, save_path=None, return_bytes=False):
+def generate_student_qr_code(student_data, save_path=None, return_bytes=False, stable=False):
     """
     Generate QR code for student (backward compatibility)
     Args:
         student_data (dict): Student information
         save_path (str): Path to save QR code image
         return_bytes (bool): Return as bytes instead of saving
+        stable (bool): Stamp the payload with the date only (see generate_user_qr_code)
     Returns:
         str or bytes: File path or image bytes
     """
-    return generate_user_qr_code(student_data, 'student', save_path, return_bytes)
+    return generate_user_qr_code(student_data, 'student', save_path, return_bytes, stable)
 
-def create_qr_data(user_data, user_type='student'):
+def create_qr_data(user_data, user_type='student', stable=False):
     """
     Create standardized QR code data format for any user type
     Args:
         user_data (dict): User information
         user_type (str): Type of user (student, professor, admin)
+        stable (bool): Use the date instead of the full timestamp for
+            generated_at, so the payload is the same all day
     Returns:
         str: JSON formatted QR code data
     """
+    now = datetime.utcnow()
+    generated_at = now.date().isoformat() if stable else now.isoformat()
+    
     if user_type == 'student':
+        if orjson is None:
+            return _student_qr_json(user_data, generated_at)
         qr_payload = {
             'type': 'student_attendance',
             'student_id': user_data.get('id'),
@@ -100,7 +288,7 @@ def create_qr_data(user_data, user_type='student'):
             'department': user_data.get('department'),
             'section': user_data.get('section'),
             'year_level': user_data.get('year_level'),
-            'generated_at': datetime.utcnow().isoformat(),
+            'generated_at': generated_at,
             'version': '1.0'
         }
     else:
@@ -112,11 +300,42 @@ def create_qr_data(user_data, user_type='student'):
             'email': user_data.get('email'),
             'role': user_data.get('role'),
             'name': user_data.get('display_name', user_data.get('username')),
-            'generated_at': datetime.utcnow().isoformat(),
+            'generated_at': generated_at,
             'version': '1.0'
         }
     
-    return json.dumps(qr_payload, separators=(',', ':'))
+    return _json_dumps(qr_payload)
+
+def _json_value(value):
+    """Compact JSON text for a single payload value"""
+    if value.__class__ is str:
+        return encode_basestring(value)
+    if value is None:
+        return 'null'
+    if value.__class__ is int:
+        return int.__repr__(value)
+    return _json_dumps(value)
+
+def _student_qr_json(user_data, generated_at):
+    """
+    Student attendance payload JSON, identical to encoding the dict built
+    in create_qr_data
+    Args:
+        user_data (dict): Student information
+        generated_at (str): Generation timestamp
+    Returns:
+        str: JSON formatted QR code data
+    """
+    get = user_data.get
+    return _STUDENT_QR_TEMPLATE.format(
+        _json_value(get('id')),
+        _json_value(get('student_no')),
+        _json_value(get('name')),
+        _json_value(get('department')),
+        _json_value(get('section')),
+        _json_value(get('year_level')),
+        encode_basestring(generated_at),
+    )
 
 def validate_qr_data(qr_content):
     """
@@ -154,9 +373,7 @@ def validate_qr_data(qr_content):
         }
     
     # Edge Case 4: Binary data detection
-    try:
-        qr_content.encode('utf-8')
-    except UnicodeEncodeError:
+    if not _is_utf8_encodable(qr_content):
         return {
             'valid': False,
             'error': 'QR code contains invalid binary data',
@@ -168,39 +385,28 @@ def validate_qr_data(qr_content):
     cleaned_content = qr_content.strip()
     
     # Edge Case 5: HTML/Script injection detection
-    dangerous_patterns = [
-        '<script', '</script>', '<iframe', '<object', '<embed',
-        'javascript:', 'vbscript:', 'onload=', 'onerror=', 'onclick='
-    ]
-    
-    content_lower = cleaned_content.lower()
-    for pattern in dangerous_patterns:
-        if pattern in content_lower:
-            return {
-                'valid': False,
-                'error': f'QR code contains potentially malicious content: {pattern}',
-                'error_code': 'MALICIOUS_CONTENT',
-                'data': None
-            }
+    match = _DANGEROUS_PATTERN_RE.search(cleaned_content)
+    if match:
+        return {
+            'valid': False,
+            'error': f'QR code contains potentially malicious content: {match.group(0).lower()}',
+            'error_code': 'MALICIOUS_CONTENT',
+            'data': None
+        }
     
     # Edge Case 6: SQL injection pattern detection
-    sql_patterns = [
-        "'; drop table", "'; delete from", "union select", 
-        "' or '1'='1", "' or 1=1", "--", "/*", "*/"
-    ]
-    
-    for pattern in sql_patterns:
-        if pattern in content_lower:
-            return {
-                'valid': False,
-                'error': f'QR code contains potential SQL injection pattern: {pattern}',
-                'error_code': 'SQL_INJECTION',
-                'data': None
-            }
+    match = _SQL_PATTERN_RE.search(cleaned_content)
+    if match:
+        return {
+            'valid': False,
+            'error': f'QR code contains potential SQL injection pattern: {match.group(0).lower()}',
+            'error_code': 'SQL_INJECTION',
+            'data': None
+        }
     
     try:
         # Try to parse as JSON
-        data = json.loads(cleaned_content)
+        data = _json_loads(cleaned_content)
         
         # Edge Case 7: Invalid data types in JSON
         if not isinstance(data, dict):
@@ -252,7 +458,7 @@ def validate_qr_data(qr_content):
                         data['student_id'] = int(student_id)
                     else:
                         # Check if it's a valid student ID format (could contain letters)
-                        if not student_id.replace('-', '').replace('_', '').isalnum():
+                        if not _STUDENT_ID_RE.match(student_id):
                             return {
                                 'valid': False,
                                 'error': 'student_id contains invalid characters',
@@ -287,11 +493,12 @@ def validate_qr_data(qr_content):
                     'data': None
                 }
             
-            # Sanitize Unicode characters
-            try:
-                data['name'] = name.encode('utf-8').decode('utf-8')
-                data['student_no'] = student_no.encode('utf-8').decode('utf-8')
-            except UnicodeError:
+            data['name'] = name
+            data['student_no'] = student_no
+            
+            # Sanitize Unicode characters (JSON escapes can still decode to
+            # lone surrogates)
+            if not (_is_utf8_encodable(name) and _is_utf8_encodable(student_no)):
                 return {
                     'valid': False,
                     'error': 'Invalid Unicode characters in student data',
@@ -343,16 +550,16 @@ def validate_qr_data(qr_content):
                 }
             
             # Validate legacy format (plain student number)
-            if len(cleaned_content) > 20:
-                return {
-                    'valid': False,
-                    'error': 'Legacy student number too long (max 20 characters)',
-                    'error_code': 'LEGACY_TOO_LONG',
-                    'data': None
-                }
-            
-            # Check for invalid characters in student number
-            if not cleaned_content.replace('-', '').replace('_', '').isalnum():
+            if not _LEGACY_RE.match(cleaned_content):
+                if len(cleaned_content) > 20:
+                    return {
+                        'valid': False,
+                        'error': 'Legacy student number too long (max 20 characters)',
+                        'error_code': 'LEGACY_TOO_LONG',
+                        'data': None
+                    }
+                
+                # Check for invalid characters in student number
                 return {
                     'valid': False,
                     'error': 'Legacy student number contains invalid characters',
@@ -378,12 +585,14 @@ def validate_qr_data(qr_content):
             'data': None
         }
 
-def generate_bulk_qr_codes(students_list, output_dir):
+def generate_bulk_qr_codes(students_list, output_dir, stable=False):
     """
     Generate QR codes for multiple students
     Args:
         students_list (list): List of student dictionaries
         output_dir (str): Directory to save QR code images
+        stable (bool): Stamp the payloads with the date only, so codes
+            generated earlier the same day come from the PNG cache
     Returns:
         dict: Generation results with success/failure counts
     """
@@ -396,25 +605,109 @@ def generate_bulk_qr_codes(students_list, output_dir):
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
+    jobs = []
     for student in students_list:
+        try:
+            jobs.append((student, create_qr_data(student, stable=stable)))
+        except Exception as e:
+            results['failed'] += 1
+            results['errors'].append(f"Error processing {student.get('name', 'Unknown')}: {str(e)}")
+    
+    rendered = {}
+    for _, qr_data in jobs:
+        if qr_data not in rendered:
+            rendered[qr_data] = _cached_qr_png(qr_data) if stable else None
+    missing = [qr_data for qr_data, png_bytes in rendered.items() if png_bytes is None]
+    
+    if missing:
+        rendered.update(zip(missing, _render_bulk_qr_pngs(missing, cache=stable)))
+    
+    for student, qr_data in jobs:
+        png_bytes = rendered[qr_data]
+        if png_bytes is None:
+            results['failed'] += 1
+            results['errors'].append(f"Failed to generate QR for {student.get('name', 'Unknown')}")
+            continue
+        
         try:
             filename = f"{student.get('student_no', 'unknown')}_qr.png"
-            filepath = os.path.join(output_dir, filename)
-            
-            success = generate_student_qr_code(student, save_path=filepath)
-            
-            if success:
-                results['success'] += 1
-            else:
-                results['failed'] += 1
-                results['errors'].append(f"Failed to generate QR for {student.get('name', 'Unknown')}")
-                
+            with open(os.path.join(output_dir, filename), 'wb') as f:
+                f.write(png_bytes)
+            results['success'] += 1
         except Exception as e:
             results['failed'] += 1
             results['errors'].append(f"Error processing {student.get('name', 'Unknown')}: {str(e)}")
     
     return results
 
+def _render_bulk_qr_pngs(payloads, cache=False):
+    """
+    Render uncached QR payloads for generate_bulk_qr_codes
+    Args:
+        payloads (list): Distinct QR code data strings
+        cache (bool): Cache the rendered PNGs (stable payloads only)
+    Returns:
+        list: PNG bytes for each payload, or None where rendering failed
+    """
+    pngs = None
+    
+    # Small batches stay serial; process start-up would outweigh the work
+    if len(payloads) >= _BULK_QR_PARALLEL_MIN and _bulk_qr_worker_count() > 1:
+        pool = _get_bulk_qr_pool()
+        try:
+            pngs = list(pool.map(_render_bulk_qr_png, payloads, chunksize=8))
+        except BrokenProcessPool:
+            _discard_bulk_qr_pool(pool)
+    
+    if pngs is None:
+        pngs = [_render_bulk_qr_png(qr_data) for qr_data in payloads]
+    
+    if cache:
+        for qr_data, png_bytes in zip(payloads, pngs):
+            if png_bytes is not None:
+                _remember_qr_png(qr_data, png_bytes)
+    return pngs
+
+def _bulk_qr_worker_count():
+    """Worker processes for bulk QR generation"""
+    return min(_BULK_QR_MAX_WORKERS, os.cpu_count() or 1)
+
+def _get_bulk_qr_pool():
+    """Return the shared bulk QR process pool, starting it on first use"""
+    global _bulk_qr_pool
+    with _bulk_qr_pool_lock:
+        if _bulk_qr_pool is None:
+            start_method = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                            else 'spawn')
+            _bulk_qr_pool = ProcessPoolExecutor(
+                max_workers=_bulk_qr_worker_count(),
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        return _bulk_qr_pool
+
+def _discard_bulk_qr_pool(pool):
+    """Drop a broken pool so the next bulk run starts a fresh one"""
+    global _bulk_qr_pool
+    with _bulk_qr_pool_lock:
+        if _bulk_qr_pool is pool:
+            _bulk_qr_pool = None
+    pool.shutdown(wait=False)
+
+def _render_bulk_qr_png(qr_data):
+    """
+    Render one bulk QR payload
+    Module-level so it can run in a worker process.
+    Args:
+        qr_data (str): QR code data
+    Returns:
+        bytes: PNG bytes, or None if rendering failed
+    """
+    try:
+        return _render_qr_png(qr_data)
+    except Exception as e:
+        print(f"Error generating QR code: {str(e)}")
+        return None
+
 def create_qr_code_with_info(student_data, include_photo=False, size=(300, 400)):
     """
     Create QR code with student information overlay
@@ -506,6 +799,36 @@ def scan_qr_from_image(image_path):
         'data': None
     }
 
+def _get_qr_detector(cv2):
+    """cv2.QRCodeDetector for the current thread"""
+    detector = getattr(_thread_local, 'qr_detector', None)
+    if detector is None:
+        detector = _thread_local.qr_detector = cv2.QRCodeDetector()
+    return detector
+
+def _decode_with_opencv(cv2, image_gray):
+    """
+    Decode QR codes with OpenCV's QR detector
+    Args:
+        cv2: The cv2 module
+        image_gray: Grayscale image array
+    Returns:
+        list: (data, type, (x, y, width, height)) for each decoded QR code
+    """
+    try:
+        found, decoded, points, _ = _get_qr_detector(cv2).detectAndDecodeMulti(image_gray)
+    except cv2.error:
+        return []
+    
+    if not found:
+        return []
+    
+    return [
+        (data, 'QRCODE', cv2.boundingRect(corners.astype(np.float32)))
+        for data, corners in zip(decoded, points)
+        if data
+    ]
+
 def process_uploaded_qr_image(uploaded_file):
     """
     Process uploaded QR code image with comprehensive edge case handling
@@ -603,9 +926,10 @@ def process_uploaded_qr_image(uploaded_file):
                     'data': None
                 }
             
-            # Convert to RGB if necessary
-            if image.mode not in ('RGB', 'L'):
-                image = image.convert('RGB')
+            # QR detection only needs luminance; decoding to grayscale in
+            # Pillow leaves a single 8-bit channel for the scanner
+            if image.mode != 'L':
+                image = image.convert('L')
                 
         except Exception as e:
             return {
@@ -618,11 +942,18 @@ def process_uploaded_qr_image(uploaded_file):
         # Edge Case 7: Check if image scanning libraries are available
         try:
             import cv2
+        except ImportError:
+            cv2 = None
+        
+        try:
             import pyzbar.pyzbar as pyzbar
-        except ImportError as e:
+        except ImportError:
+            pyzbar = None
+        
+        if cv2 is None and pyzbar is None:
             return {
                 'success': False,
-                'error': 'QR image processing requires opencv-python and pyzbar packages. Please install them or enter QR data manually.',
+                'error': 'QR image processing requires opencv-python or pyzbar. Please install them or enter QR data manually.',
                 'error_code': 'MISSING_LIBRARIES',
                 'data': None,
                 'install_hint': 'Run: pip install opencv-python pyzbar'
@@ -630,7 +961,7 @@ def process_uploaded_qr_image(uploaded_file):
         
         # Edge Case 8: Process image for QR codes
         try:
-            # Convert PIL image to OpenCV format
+            # Expose the grayscale pixels as an array for the scanner
             if np is None:
                 return {
                     'success': False,
@@ -639,14 +970,16 @@ def process_uploaded_qr_image(uploaded_file):
                     'data': None
                 }
                 
-            image_array = np.array(image)
-            if len(image_array.shape) == 3:
-                image_cv = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-            else:
-                image_cv = image_array
+            image_gray = np.asarray(image)
             
-            # Decode QR codes
-            qr_codes = pyzbar.decode(image_cv)
+            # Decode QR codes: OpenCV's detector first, pyzbar only when it finds nothing
+            qr_codes = _decode_with_opencv(cv2, image_gray) if cv2 is not None else []
+            if not qr_codes and pyzbar is not None:
+                qr_codes = [
+                    (code.data, code.type,
+                     (code.rect.left, code.rect.top, code.rect.width, code.rect.height))
+                    for code in pyzbar.decode(image_gray)
+                ]
             
             # Edge Case 9: No QR code found
             if not qr_codes:
@@ -668,8 +1001,9 @@ def process_uploaded_qr_image(uploaded_file):
                 }
             
             # Extract QR code data
-            qr_code = qr_codes[0]
-            qr_data = qr_code.data.decode('utf-8')
+            qr_data, qr_type, (x, y, qr_width, qr_height) = qr_codes[0]
+            if isinstance(qr_data, bytes):
+                qr_data = qr_data.decode('utf-8')
             
             # Edge Case 11: Empty QR code data
             if not qr_data:
@@ -697,12 +1031,12 @@ def process_uploaded_qr_image(uploaded_file):
                 'error_code': None,
                 'data': validation_result['data'],
                 'raw_data': qr_data,
-                'qr_type': qr_code.type,
+                'qr_type': qr_type,
                 'qr_rect': {
-                    'x': qr_code.rect.left,
-                    'y': qr_code.rect.top,
-                    'width': qr_code.rect.width,
-                    'height': qr_code.rect.height
+                    'x': x,
+                    'y': y,
+                    'width': qr_width,
+                    'height': qr_height
                 }
             }
             
@@ -732,11 +1066,14 @@ def get_qr_scanner_status():
         'qr_generation': True,  # Always available with qrcode package
         'camera_scanning': False,
         'image_scanning': False,
+        'opencv_available': False,
+        'pyzbar_available': False,
         'missing_packages': []
     }
     
     try:
         import cv2
+        status['opencv_available'] = True
         status['camera_scanning'] = True
         status['image_scanning'] = True
     except ImportError:
@@ -744,6 +1081,7 @@ def get_qr_scanner_status():
     
     try:
         import pyzbar
+        status['pyzbar_available'] = True
     except ImportError:
         status['missing_packages'].append('pyzbar')
         status['camera_scanning'] = False
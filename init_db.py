@@ -4,10 +4,96 @@
 from app import create_app, db
 from app.models import User, Room, AttendanceSession, Student, AttendanceRecord
 from werkzeug.security import generate_password_hash
+from sqlalchemy import text
 from datetime import datetime, time, timedelta
 import sys
 import os
 
+# Merges schedule time-ins that duplicate an earlier record for the same
+# student and SessionSchedule into the earliest one: it takes the group's
+# latest time-out, their events are repointed to it, then they are deleted
+_DUPLICATE_SCHEDULE_RECORD = """
+    attendance_records.schedule_session_id IS NOT NULL
+    AND attendance_records.id > (
+        SELECT MIN(kept.id) FROM attendance_records kept
+        WHERE kept.student_id = attendance_records.student_id
+        AND kept.schedule_session_id = attendance_records.schedule_session_id
+    )
+"""
+
+# Latest time-out in the same student/schedule group as attendance_records
+_LATEST_GROUP_TIME_OUT = """
+    SELECT {column} FROM attendance_records grp
+    WHERE grp.student_id = attendance_records.student_id
+    AND grp.schedule_session_id = attendance_records.schedule_session_id
+    AND grp.time_out IS NOT NULL
+    ORDER BY grp.time_out DESC, grp.id DESC
+    LIMIT 1
+"""
+
+_MERGE_DUPLICATE_SCHEDULE_TIME_OUTS = text(f"""
+    UPDATE attendance_records SET
+        time_out = ({_LATEST_GROUP_TIME_OUT.format(column='grp.time_out')}),
+        time_out_scanned_by = ({_LATEST_GROUP_TIME_OUT.format(column='grp.time_out_scanned_by')}),
+        is_active = :inactive
+    WHERE attendance_records.schedule_session_id IS NOT NULL
+    AND attendance_records.id = (
+        SELECT MIN(kept.id) FROM attendance_records kept
+        WHERE kept.student_id = attendance_records.student_id
+        AND kept.schedule_session_id = attendance_records.schedule_session_id
+    )
+    AND EXISTS (
+        SELECT 1 FROM attendance_records dup
+        WHERE dup.student_id = attendance_records.student_id
+        AND dup.schedule_session_id = attendance_records.schedule_session_id
+        AND dup.id <> attendance_records.id
+        AND dup.time_out IS NOT NULL
+    )
+""").bindparams(inactive=False)
+
+_MERGE_DUPLICATE_SCHEDULE_EVENTS = text(f"""
+    UPDATE attendance_events SET attendance_record_id = (
+        SELECT MIN(kept.id) FROM attendance_records kept
+        JOIN attendance_records dup
+            ON dup.student_id = kept.student_id
+            AND dup.schedule_session_id = kept.schedule_session_id
+        WHERE dup.id = attendance_events.attendance_record_id
+    )
+    WHERE attendance_record_id IN (
+        SELECT attendance_records.id FROM attendance_records WHERE {_DUPLICATE_SCHEDULE_RECORD}
+    )
+""")
+
+_DELETE_DUPLICATE_SCHEDULE_RECORDS = text(
+    f"DELETE FROM attendance_records WHERE {_DUPLICATE_SCHEDULE_RECORD}"
+)
+
+def ensure_attendance_indexes():
+    """
+    Create the unique (student_id, schedule_session_id) index on databases that
+    predate it. db.create_all() never adds indexes to existing tables, and
+    schedule time-ins rely on this one for ON CONFLICT. Duplicate schedule
+    records are merged into the earliest one first: it keeps the latest
+    time-out of the group and takes over their events, then they are deleted.
+    Returns:
+        int: Duplicate records merged, or None if the index already existed
+    """
+    index = next(
+        index for index in AttendanceRecord.__table__.indexes
+        if index.name == 'ix_attendance_student_schedule'
+    )
+    existing = {ix['name'] for ix in db.inspect(db.engine).get_indexes('attendance_records')}
+    if index.name in existing:
+        return None
+    
+    db.session.execute(_MERGE_DUPLICATE_SCHEDULE_TIME_OUTS)
+    db.session.execute(_MERGE_DUPLICATE_SCHEDULE_EVENTS)
+    removed = db.session.execute(_DELETE_DUPLICATE_SCHEDULE_RECORDS).rowcount
+    db.session.commit()
+    
+    index.create(bind=db.engine)
+    return removed
+
 def init_database():
     """Initialize the database with tables and default data"""
     print("Initializing ScanMe Attendance System Database...")
@@ -22,6 +108,10 @@ def init_database():
             db.create_all()
             print("✓ Database tables created successfully")
             
+            removed = ensure_attendance_indexes()
+            if removed is not None:
+                print(f"✓ Created unique schedule attendance index ({removed} duplicate records merged into the earliest)")
+            
             # Check if admin user exists
             admin_user = User.query.filter_by(username='admin').first()
             if not admin_user:
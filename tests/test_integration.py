@@ -72,8 +72,10 @@ def test_student_cannot_access_admin(client, student_user):
 
 
 @pytest.mark.integration
-def test_student_crud_flow(app, client, professor_user):
+def test_student_crud_flow(app, client, professor_user, tmp_path):
     """Professor should add, view, edit, and delete a student."""
+    # Student QR images are saved under the static folder; keep them out of the repo
+    app.static_folder = str(tmp_path)
     login_as(client, 'prof_user', 'TestPass123!')
 
     # Add student
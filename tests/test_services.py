@@ -1,10 +1,12 @@
+import logging
 import pytest
 from datetime import datetime, timedelta
 from app import db
 from app.models.user_model import User
 from app.models.student_model import Student
 from app.models.room_model import Room
-from app.models.attendance_model import AttendanceSession
+from app.models.attendance_model import AttendanceRecord, AttendanceSession
+from app.models.session_schedule_model import SessionSchedule
 from app.services.new_attendance_service import NewAttendanceService
 from app.services.attendance_state_service import AttendanceStateService
 
@@ -28,6 +30,26 @@ def active_session(app, sample_room):
         return session.id
 
 
+@pytest.fixture
+def active_schedule(app, sample_room):
+    """Create a SessionSchedule that is currently running."""
+    with app.app_context():
+        instructor = User.create_user('schedule_prof', 'schedule_prof@scanme.test', 'Password123!', 'professor')
+        start = datetime.now() - timedelta(minutes=5)
+        end = start + timedelta(hours=1)
+        schedule = SessionSchedule(
+            title='Scheduled Class',
+            room_id=sample_room,
+            instructor_id=instructor.id,
+            session_date=start.date(),
+            start_time=start.time(),
+            end_time=end.time()
+        )
+        db.session.add(schedule)
+        db.session.commit()
+        return schedule.id
+
+
 @pytest.mark.unit
 def test_new_attendance_service_time_in(app, sample_student, sample_room, active_session):
     with app.app_context():
@@ -92,3 +114,385 @@ def test_attendance_state_service_invalid_input(app):
         )
         assert result['success'] is False
         assert result['action'] in ('error', 'validation_error')
+
+
+@pytest.mark.unit
+def test_schedule_attendance_repeat_tap_does_not_duplicate(app, sample_student, active_schedule):
+    with app.app_context():
+        scanner = User.create_user('svc_scanner4', 'svc_scanner4@scanme.test', 'Password123!', 'professor')
+        schedule = db.session.get(SessionSchedule, active_schedule)
+        service = NewAttendanceService()
+
+        first = service.process_session_schedule_attendance(sample_student, schedule, scanner.id)
+        second = service.process_session_schedule_attendance(sample_student, schedule, scanner.id)
+
+        assert first['success'] is True
+        assert first['action'] == 'time_in'
+        assert first['is_late'] is True
+        assert second['action'] == 'already_timed_in'
+        assert AttendanceRecord.query.filter_by(
+            student_id=sample_student, schedule_session_id=active_schedule
+        ).count() == 1
+
+
+@pytest.mark.unit
+def test_ensure_attendance_indexes_merges_duplicate_schedule_records(app, sample_student, sample_room,
+                                                                     active_schedule):
+    from sqlalchemy import text
+    from app.models.attendance_event_model import AttendanceEvent
+    from init_db import ensure_attendance_indexes
+
+    with app.app_context():
+        # A database created before the unique index was declared
+        db.session.execute(text('DROP INDEX ix_attendance_student_schedule'))
+        scanner = User.create_user('svc_scanner9', 'svc_scanner9@scanme.test', 'Password123!', 'professor')
+
+        records = []
+        for _ in range(2):
+            record = AttendanceRecord(sample_student, sample_room, scanner.id)
+            record.schedule_session_id = active_schedule
+            db.session.add(record)
+            db.session.flush()
+            records.append(record)
+        kept, duplicate = records
+        duplicate.time_out = kept.time_in + timedelta(minutes=50)
+        duplicate.time_out_scanned_by = scanner.id
+        event = AttendanceEvent(sample_student, sample_room, 'time_in', scanner.id,
+                                attendance_record_id=duplicate.id)
+        db.session.add(event)
+        db.session.commit()
+        kept_id, event_id = kept.id, event.id
+
+        assert ensure_attendance_indexes() == 1
+        assert ensure_attendance_indexes() is None
+        db.session.expire_all()
+        merged = AttendanceRecord.query.filter_by(schedule_session_id=active_schedule).one()
+        assert merged.id == kept_id
+        assert merged.time_out == merged.time_in + timedelta(minutes=50)
+        assert merged.time_out_scanned_by == scanner.id
+        assert merged.is_active is False
+        assert db.session.get(AttendanceEvent, event_id).attendance_record_id == kept_id
+
+        # The schedule time-in path relies on the recreated index
+        schedule = db.session.get(SessionSchedule, active_schedule)
+        repeat = NewAttendanceService().process_session_schedule_attendance(sample_student, schedule, scanner.id)
+        assert repeat['action'] == 'complete'
+
+
+@pytest.mark.unit
+def test_session_timing_cache_invalidated_on_update(app, sample_student, sample_room, active_session):
+    with app.app_context():
+        scanner = User.create_user('svc_scanner5', 'svc_scanner5@scanme.test', 'Password123!', 'professor')
+        service = NewAttendanceService()
+        session = db.session.get(AttendanceSession, active_session)
+        # The first scan caches the session as open
+        first = service.process_attendance_scan(
+            student_id=sample_student,
+            room_id=sample_room,
+            session_id=active_session,
+            scanned_by=scanner.id
+        )
+        assert first['action'] == 'time_in'
+
+        session.close_session()
+
+        result = service.process_attendance_scan(
+            student_id=sample_student,
+            room_id=sample_room,
+            session_id=active_session,
+            scanned_by=scanner.id
+        )
+        assert result['success'] is False
+        assert result['message'] == 'Session is inactive'
+
+
+@pytest.mark.unit
+def test_student_name_cache_skips_misses_and_expires(app, sample_student, monkeypatch):
+    from app.services import new_attendance_service
+    from app.services.new_attendance_service import STUDENT_NAME_CACHE_TTL, _student_full_name
+
+    with app.app_context():
+        students = Student.__table__
+        # Core statements bypass the ORM events, like a change made by another worker
+        assert _student_full_name(9999) is None
+        db.session.execute(students.insert().values(
+            id=9999, student_no='ST9999', first_name='New', last_name='Student',
+            email='new.student@scanme.test', department='CS', section='A',
+            year_level=1, qr_code_data='qr-9999'
+        ))
+        assert _student_full_name(9999) == 'New Student'
+
+        assert _student_full_name(sample_student) == 'John Doe'
+        db.session.execute(
+            students.update().where(students.c.id == sample_student).values(first_name='Jon')
+        )
+        assert _student_full_name(sample_student) == 'John Doe'
+
+        now = new_attendance_service.time.monotonic()
+        monkeypatch.setattr(new_attendance_service.time, 'monotonic',
+                            lambda: now + STUDENT_NAME_CACHE_TTL + 1)
+        assert _student_full_name(sample_student) == 'Jon Doe'
+
+
+@pytest.mark.unit
+def test_schedule_attendance_time_out_in_grace_period(app, sample_student, sample_room):
+    with app.app_context():
+        scanner = User.create_user('svc_scanner7', 'svc_scanner7@scanme.test', 'Password123!', 'professor')
+        end = datetime.now() - timedelta(minutes=5)
+        start = end - timedelta(hours=1)
+        schedule = SessionSchedule(
+            title='Ended Class',
+            room_id=sample_room,
+            instructor_id=scanner.id,
+            session_date=start.date(),
+            start_time=start.time(),
+            end_time=end.time()
+        )
+        db.session.add(schedule)
+        db.session.commit()
+
+        record = AttendanceRecord(student_id=sample_student, room_id=sample_room, scanned_by=scanner.id)
+        record.schedule_session_id = schedule.id
+        record.time_in = start
+        db.session.add(record)
+        db.session.commit()
+
+        result = NewAttendanceService().process_session_schedule_attendance(
+            sample_student, schedule, scanner.id
+        )
+        assert result['success'] is True
+        assert result['action'] == 'time_out'
+        assert db.session.get(AttendanceRecord, record.id).time_out is not None
+
+
+@pytest.mark.unit
+def test_qr_data_validation_rejects_injection_case_insensitively():
+    from app.services.qr_image_service import QRImageProcessingService
+
+    assert QRImageProcessingService._validate_qr_data('STU12345')['valid']
+    for payload in ('JavaScript:alert(1)', 'x<SCRIPT>', 'DATA:text/html,hi', '<iFrame src=x>'):
+        result = QRImageProcessingService._validate_qr_data(payload)
+        assert not result['valid']
+        assert 'malicious' in result['error']
+
+
+@pytest.mark.unit
+def test_qr_data_validation_logs_every_non_standard_scan(caplog):
+    from app.services.qr_image_service import QRImageProcessingService
+
+    with caplog.at_level(logging.INFO, logger='app.services.qr_image_service'):
+        for _ in range(2):
+            assert QRImageProcessingService._validate_qr_data('CUSTOM-1234')['valid']
+        assert QRImageProcessingService._validate_qr_data('STU12345')['valid']
+
+    assert [r.getMessage() for r in caplog.records].count(
+        'QR code with non-standard format detected: CUSTOM-1234...'
+    ) == 2
+    assert len(caplog.records) == 2
+
+
+@pytest.mark.unit
+def test_create_student_from_qr_data_skips_taken_email_suffixes(app):
+    from app.services.student_identification_service import StudentIdentificationService
+
+    with app.app_context():
+        for student_no, email in (('ST2023002', 'john.doe@university.edu'), ('ST2023003', 'john.doe1@university.edu')):
+            db.session.add(Student(student_no=student_no, first_name='John', last_name='Doe',
+                                   email=email, department='CS', section='A', year_level=1))
+        db.session.commit()
+
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023004', 'name': 'John Doe'}
+        )
+        assert error is None
+        assert student.email == 'john.doe2@university.edu'
+
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023005', 'name': 'Jane Roe'}
+        )
+        assert error is None
+        assert student.email == 'jane.roe@university.edu'
+
+
+@pytest.mark.unit
+def test_create_student_from_qr_data_rejects_existing_student_no(app, sample_student):
+    from app.services.student_identification_service import StudentIdentificationService
+
+    with app.app_context():
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023001', 'name': 'Jane Roe'}
+        )
+        assert student is None
+        assert error['error_code'] == 'DUPLICATE_STUDENT_NO'
+
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023999', 'name': 'Jane Roe'}
+        )
+        assert error is None
+        assert student.id is not None
+        assert (student.first_name, student.last_name) == ('Jane', 'Roe')
+        assert student.qr_code_data.startswith('SCANME_')
+
+
+@pytest.mark.unit
+def test_legacy_lookup_matches_student_number_prefix(app, sample_student):
+    from app.services.student_identification_service import StudentIdentificationService
+
+    with app.app_context():
+        student, error = StudentIdentificationService.find_student_by_qr_data(
+            {'legacy': True, 'student_no': 'ST2023'}
+        )
+        assert error is None
+        assert student.student_no == 'ST2023001'
+
+        db.session.add(Student(student_no='ST2023002', first_name='Ann', last_name='Lee',
+                               email='ann.lee@scanme.test', department='CS', section='A', year_level=1))
+        db.session.add(Student(student_no='ST2023003', first_name='Bo', last_name='Kim',
+                               email='bo.kim@scanme.test', department='CS', section='A', year_level=1))
+        db.session.commit()
+        student, error = StudentIdentificationService.find_student_by_qr_data(
+            {'legacy': True, 'student_no': 'ST2023'}
+        )
+        assert student is None
+        assert error['error_code'] == 'MULTIPLE_SIMILAR_STUDENTS'
+        assert error['similar_count'] == 3
+
+
+@pytest.mark.unit
+def test_create_student_from_qr_data_handles_email_collisions(app, sample_student):
+    from app.services.student_identification_service import StudentIdentificationService
+
+    with app.app_context():
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023100', 'name': 'John Doe'}
+        )
+        assert error is None
+        assert student.email == 'john.doe@university.edu'
+
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023101', 'name': 'John Doe'}
+        )
+        assert error is None
+        assert student.email == 'john.doe1@university.edu'
+
+        student, error = StudentIdentificationService.create_student_from_qr_data(
+            {'student_no': 'ST2023102', 'name': 'Jane Doe', 'email': 'john.doe@scanme.test'}
+        )
+        assert student is None
+        assert error['error_code'] == 'DUPLICATE_EMAIL'
+
+        # The failed insert only rolled back its savepoint
+        db.session.commit()
+        assert Student.query.filter(Student.student_no.in_(['ST2023100', 'ST2023101'])).count() == 2
+
+
+@pytest.mark.unit
+def test_validate_image_file_uses_content_length(app):
+    import io
+    from werkzeug.datastructures import FileStorage, Headers
+    from app.services.qr_image_service import QRImageProcessingService
+
+    with app.test_request_context(method='POST', data=b'x' * 100):
+        empty = FileStorage(stream=io.BytesIO(b''), filename='qr.png', content_type='image/png')
+        assert QRImageProcessingService.validate_image_file(empty)['error'] == 'File is empty'
+
+        image = FileStorage(stream=io.BytesIO(b'\x89PNG'), filename='qr.png', content_type='image/png')
+        assert QRImageProcessingService.validate_image_file(image)['valid']
+        assert image.stream.tell() == 0
+
+    big = FileStorage(stream=io.BytesIO(b'x' * (QRImageProcessingService.MAX_FILE_SIZE + 1)),
+                      filename='qr.png', content_type='image/png')
+    assert 'exceeds maximum' in QRImageProcessingService.validate_image_file(big)['error']
+
+    # A part's own Content-Length is client-controlled and not enforced
+    understated = FileStorage(stream=io.BytesIO(b'x' * (QRImageProcessingService.MAX_FILE_SIZE + 1)),
+                              filename='qr.png',
+                              headers=Headers({'Content-Type': 'image/png', 'Content-Length': '1'}))
+    assert understated.content_length == 1
+    assert 'exceeds maximum' in QRImageProcessingService.validate_image_file(understated)['error']
+
+
+@pytest.mark.unit
+def test_duration_normalizes_aware_times_to_naive_utc():
+    from datetime import timezone
+    from app.services.time_management_service import TimeManagementService
+
+    time_in = datetime(2024, 5, 6, 8, 0, tzinfo=timezone.utc)
+    time_out = datetime(2024, 5, 6, 11, 30, tzinfo=timezone(timedelta(hours=2)))
+    result = TimeManagementService.calculate_duration_safe(time_in, time_out)
+
+    assert result['success']
+    assert result['time_in'] == datetime(2024, 5, 6, 8, 0)
+    assert result['time_out'] == datetime(2024, 5, 6, 9, 30)
+    assert result['duration_formatted'] == '01:30'
+
+
+@pytest.mark.unit
+def test_duration_flags_extreme_and_corrects_negative():
+    from app.services.time_management_service import TimeManagementService
+
+    start = datetime(2024, 5, 6, 8, 0)
+    extreme = TimeManagementService.calculate_duration_safe(start, start + timedelta(hours=20))
+    assert not extreme['is_reasonable_duration']
+    assert 'extreme_duration_flagged' in extreme['corrections_applied']
+
+    swapped = TimeManagementService.calculate_duration_safe(start, start - timedelta(minutes=2))
+    assert swapped['is_reasonable_duration']
+    assert swapped['corrections_applied'] == ['negative_duration_correction', 'clock_sync_correction']
+    assert swapped['duration_seconds'] == 60
+
+
+@pytest.mark.unit
+def test_clock_sync_detects_rapid_scans_gaps_and_future_times():
+    from app.services.time_management_service import TimeManagementService
+
+    base = datetime(2024, 5, 6, 8, 0)
+    times = [base + timedelta(hours=2), base, base + timedelta(milliseconds=500),
+             datetime.utcnow() + timedelta(hours=1)]
+    result = TimeManagementService.detect_clock_synchronization_issues(times)
+
+    assert result['has_issues']
+    assert result['issues'][0] == 'Extremely rapid scans detected: 0.5 seconds apart'
+    assert result['issues'][1] == 'Large time gap detected: 2.0 hours'
+    assert result['issues'][-1] == 'Future timestamps detected: 1 times in the future'
+    assert result['analyzed_count'] == 4
+
+
+@pytest.mark.unit
+def test_session_scheduling_reports_room_overlaps(app, sample_room, active_session):
+    from app.services.time_management_service import SessionTimeValidator
+
+    with app.app_context():
+        session = db.session.get(AttendanceSession, active_session)
+        start, end = session.start_time, session.end_time
+
+        overlapping = SessionTimeValidator.validate_session_scheduling(
+            sample_room, start + timedelta(minutes=30), end + timedelta(hours=1))
+        assert not overlapping['valid']
+        assert "Overlaps with session 'Test Session'" in overlapping['conflicts'][0]
+
+        editing = SessionTimeValidator.validate_session_scheduling(
+            sample_room, start, end, session_id=active_session)
+        assert not any('Overlaps' in c for c in editing['conflicts'])
+
+        adjacent = SessionTimeValidator.validate_session_scheduling(
+            sample_room, end, end + timedelta(hours=1))
+        assert not any('Overlaps' in c for c in adjacent['conflicts'])
+
+
+@pytest.mark.unit
+def test_late_arrival_minutes_and_grace_boundary():
+    from app.services.time_management_service import TimeManagementService
+
+    start = datetime(2024, 5, 6, 8, 0)
+    late = TimeManagementService.calculate_late_arrival(start, start + timedelta(minutes=25, seconds=59))
+    assert late['is_late'] and late['lateness_minutes'] == 15
+    assert not late['at_grace_boundary']
+
+    boundary = TimeManagementService.calculate_late_arrival(start, start + timedelta(minutes=10, seconds=20))
+    assert boundary['is_late'] and boundary['lateness_minutes'] == 0
+    assert boundary['at_grace_boundary']
+
+    early = TimeManagementService.calculate_late_arrival(start, start - timedelta(minutes=7, seconds=30))
+    assert not early['is_late']
+    assert early['is_early'] and early['early_minutes'] == 7
@@ -1,4 +1,7 @@
+import json
+import os
 import pytest
+from datetime import date, datetime, timedelta
 from app.utils.auth_utils import (
     hash_password,
     verify_password,
@@ -19,6 +22,26 @@ def test_hash_and_verify_password():
     assert verify_password(hashed, 'WrongPassword') is False
 
 
+@pytest.mark.unit
+def test_password_hashes_stay_werkzeug_compatible():
+    from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+    hashed = hash_password('MySecureP@ss1')
+    assert hashed.startswith(f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}$')
+    assert check_password_hash(hashed, 'MySecureP@ss1') is True
+
+    legacy = generate_password_hash('admin123')
+    assert verify_password(legacy, 'admin123') is True
+    assert verify_password(legacy, 'admin124') is False
+
+
+@pytest.mark.unit
+def test_verify_password_rejects_missing_or_malformed_hashes():
+    assert verify_password(None, 'MySecureP@ss1') is False
+    assert verify_password('', 'MySecureP@ss1') is False
+    assert verify_password('not-a-hash', 'MySecureP@ss1') is False
+
+
 @pytest.mark.unit
 def test_validate_email():
     assert validate_email('user@example.com') is True
@@ -50,6 +73,23 @@ def test_validate_password_strength():
     assert validate_password('NoSpecial1')['valid'] is False
 
 
+@pytest.mark.unit
+def test_validate_password_reports_each_missing_class():
+    assert validate_password('éééééééé')['errors'] == [
+        "Password must contain at least one uppercase letter",
+        "Password must contain at least one lowercase letter",
+        "Password must contain at least one number",
+        "Password must contain at least one special character",
+    ]
+    assert validate_password('lower-only') == {
+        'valid': False,
+        'errors': [
+            "Password must contain at least one uppercase letter",
+            "Password must contain at least one number",
+        ]
+    }
+
+
 @pytest.mark.unit
 def test_validate_student_data():
     valid = {
@@ -72,6 +112,18 @@ def test_validate_student_data():
     missing['first_name'] = ''
     assert validate_student_data(missing)['valid'] is False
 
+    bad_chars = valid.copy()
+    bad_chars['student_no'] = 'ST 2023/001'
+    assert validate_student_data(bad_chars)['errors'] == [
+        "Student number can only contain letters, numbers, hyphens, and underscores"
+    ]
+
+    too_short = valid.copy()
+    too_short['student_no'] = ' S!1 '
+    assert validate_student_data(too_short)['errors'] == [
+        "Student number must be between 6 and 20 characters"
+    ]
+
 
 @pytest.mark.unit
 def test_validate_room_data():
@@ -111,3 +163,432 @@ def test_get_user_permissions(app):
         stud_perms = get_user_permissions(student)
         assert stud_perms['can_view_dashboard'] is True
         assert stud_perms['can_view_reports'] is False
+
+        # Callers get their own copy of the shared per-role permission set
+        admin_perms['can_manage_users'] = False
+        assert get_user_permissions(admin)['can_manage_users'] is True
+        assert not any(get_user_permissions(None).values())
+
+
+@pytest.mark.unit
+def test_export_attendance_to_excel_styles_rows_by_status():
+    from openpyxl import load_workbook
+    from app.utils.export_utils import export_attendance_to_excel
+
+    rows = [
+        {'Student Name': 'Jane Doe', 'Attendance Status': 'Present (On-Time)'},
+        {'Student Name': 'John Smith', 'Attendance Status': 'Absent (No Time-Out)'},
+    ]
+    path = export_attendance_to_excel(rows, filename='test_attendance_export.xlsx')
+    try:
+        ws = load_workbook(path)['Attendance Report']
+        assert [c.value for c in ws[1]] == ['Student Name', 'Attendance Status']
+        assert ws['A1'].font.bold
+        assert ws['A2'].fill.start_color.rgb.endswith('D1FAE5')
+        assert ws['B3'].fill.start_color.rgb.endswith('FEE2E2')
+        assert ws['B3'].font.color.rgb.endswith('991B1B')
+        assert ws.column_dimensions['B'].width == pytest.approx((len('Absent (No Time-Out)') + 2) * 1.2)
+    finally:
+        os.remove(path)
+
+
+@pytest.mark.unit
+def test_export_students_to_excel_sizes_columns_from_data():
+    from openpyxl import load_workbook
+    from app.utils.export_utils import export_students_to_excel
+
+    students = [
+        {'Student No': 'ST2023001', 'Name': 'Jane Doe'},
+        {'Student No': 'ST2023002', 'Name': 'A' * 80},
+        {'Student No': 'ST2023003', 'Name': 'Jo', 'Sec': None},
+    ]
+    path = export_students_to_excel(students, filename='test_students_export.xlsx')
+    try:
+        ws = load_workbook(path)['Students']
+        assert [c.value for c in ws[1]] == ['Student No', 'Name', 'Sec']
+        assert ws.column_dimensions['A'].width == pytest.approx((len('Student No') + 2) * 1.2)
+        assert ws.column_dimensions['B'].width == 50
+        assert ws.column_dimensions['C'].width == pytest.approx((len('Sec') + 2) * 1.2)
+    finally:
+        os.remove(path)
+
+
+@pytest.mark.unit
+def test_export_attendance_to_csv_writes_header_and_rows():
+    import csv
+    from app.utils.export_utils import export_attendance_to_csv
+
+    rows = [
+        {'Student Name': 'Jane Doe', 'Room': 'Main 101'},
+        {'Student Name': 'John Smith'},
+    ]
+    path = export_attendance_to_csv(rows, filename='test_attendance_export.csv')
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            assert list(csv.reader(f)) == [
+                ['Student Name', 'Room'],
+                ['Jane Doe', 'Main 101'],
+                ['John Smith', ''],
+            ]
+    finally:
+        os.remove(path)
+    assert export_attendance_to_csv([]) is None
+
+
+def _report_record(scan_time, student_id=1, room_id=1, is_late=False, has_time_out=True):
+    from types import SimpleNamespace
+
+    room = SimpleNamespace(get_full_name=lambda: f'Room {room_id}')
+    student = SimpleNamespace(get_full_name=lambda: f'Student {student_id}', student_no=f'ST{student_id:04d}')
+    return SimpleNamespace(
+        scan_time=scan_time, time_in=scan_time,
+        time_out=scan_time + timedelta(hours=1) if has_time_out else None,
+        student_id=student_id, room_id=room_id, is_late=is_late,
+        room=room, student=student, scanned_by_user=None,
+        get_duration=lambda: 60
+    )
+
+
+@pytest.mark.unit
+def test_generate_reports_summarize_records_in_date_range():
+    from types import SimpleNamespace
+    from app.utils.export_utils import generate_room_report, generate_student_report
+
+    day1, day2, day3 = datetime(2024, 3, 4, 8), datetime(2024, 3, 5, 8), datetime(2024, 3, 6, 8)
+    records = [
+        _report_record(day2 + timedelta(hours=2), student_id=2, room_id=2, is_late=True),
+        _report_record(day1, student_id=1, room_id=1),
+        _report_record(day2, student_id=1, room_id=1, has_time_out=False),
+        _report_record(day3, student_id=3, room_id=1),
+    ]
+    student = SimpleNamespace(get_full_name=lambda: 'Jane Doe', student_no='ST0001',
+                              department='CS', section='A', year_level=1)
+    room = SimpleNamespace(get_full_name=lambda: 'Main 101', room_number='101', building='Main',
+                           capacity=4, room_type='classroom')
+
+    student_report = generate_student_report(student, records, start_date=date(2024, 3, 5))
+    assert student_report['summary'] == {
+        'total_days_attended': 2, 'total_scans': 3, 'complete_attendance': 2,
+        'incomplete_attendance': 1, 'late_arrivals': 1, 'on_time_percentage': 66.67,
+        'completion_rate': 66.67, 'rooms_visited': 2
+    }
+    assert student_report['daily_breakdown']['2024-03-05'] == {
+        'scans': 2, 'rooms': ['Room 1', 'Room 2'], 'times': ['08:00:00', '10:00:00'],
+        'late_count': 1, 'incomplete_count': 1
+    }
+    assert [r['date'] for r in student_report['records']] == ['2024-03-06', '2024-03-05', '2024-03-05']
+    assert student_report['records'][1]['time_in'] == '10:00:00'
+    assert student_report['records'][2]['status'] == 'Absent (No Time-Out)'
+
+    room_report = generate_room_report(room, records, end_date=date(2024, 3, 5))
+    assert room_report['summary'] == {
+        'total_scans': 3, 'unique_students': 2, 'unique_days': 2, 'late_arrivals': 1,
+        'complete_attendance': 2, 'incomplete_attendance': 1, 'completion_rate': 66.67,
+        'average_daily_attendance': 1.0, 'capacity_utilization': 50.0
+    }
+    assert room_report['daily_breakdown'] == {
+        '2024-03-05': {'total_scans': 2, 'late_count': 1, 'incomplete_count': 1, 'unique_students': 2},
+        '2024-03-04': {'total_scans': 1, 'late_count': 0, 'incomplete_count': 0, 'unique_students': 1},
+    }
+    assert [r['student'] for r in room_report['records']] == ['Student 2', 'Student 1', 'Student 1']
+
+
+@pytest.mark.unit
+def test_export_attendance_to_pdf_builds_document():
+    from app.utils.export_utils import export_attendance_to_pdf
+
+    rows = [
+        {'Student Name': 'Jane Doe', 'Duration (min)': 60, 'Attendance Status': 'Present (On-Time)'},
+        {'Student Name': 'John Smith', 'Duration (min)': 0, 'Attendance Status': 'Absent (No Time-Out)'},
+    ] * 60
+    path = export_attendance_to_pdf(rows, filename='test_attendance_export.pdf')
+    try:
+        with open(path, 'rb') as f:
+            assert f.read(5) == b'%PDF-'
+    finally:
+        os.remove(path)
+
+
+@pytest.mark.unit
+def test_create_qr_data_round_trips_through_validation():
+    import json
+    from app.utils.qr_utils import create_qr_data, validate_qr_data
+
+    qr_data = create_qr_data({
+        'id': 7, 'student_no': 'ST2023007', 'name': 'José Peña',
+        'department': 'CS', 'section': 'A', 'year_level': 2
+    })
+    assert ' ' not in qr_data.replace('José Peña', '')
+    assert json.loads(qr_data)['name'] == 'José Peña'
+
+    result = validate_qr_data(qr_data)
+    assert result['valid'] is True
+    assert result['data']['student_id'] == 7
+    assert result['data']['type'] == 'student_attendance'
+
+    malformed = validate_qr_data('{"type": "student_attendance"')
+    assert malformed['error_code'] == 'MALFORMED_JSON'
+
+
+@pytest.mark.unit
+def test_generate_user_qr_code_outputs_decodable_png(tmp_path):
+    import base64
+    from app.utils.qr_utils import generate_user_qr_code, validate_qr_data
+
+    student = {'id': 3, 'student_no': 'ST2023003', 'name': 'Jane Doe',
+               'department': 'CS', 'section': 'A', 'year_level': 1}
+    png = generate_user_qr_code(student, return_bytes=True)
+    assert png.startswith(b'\x89PNG')
+    assert base64.b64decode(generate_user_qr_code(student)).startswith(b'\x89PNG')
+
+    save_path = str(tmp_path / 'qr' / 'ST2023003_qr.png')
+    assert generate_user_qr_code(student, save_path=save_path) == save_path
+
+    cv2 = pytest.importorskip('cv2')
+    np = pytest.importorskip('numpy')
+    image = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE)
+    decoded, _, _ = cv2.QRCodeDetector().detectAndDecode(image)
+    result = validate_qr_data(decoded)
+    assert result['valid'] is True
+    assert result['data']['student_no'] == 'ST2023003'
+
+
+@pytest.mark.unit
+def test_validate_qr_data_rejects_injection_patterns():
+    from app.utils.qr_utils import validate_qr_data
+
+    script = validate_qr_data('{"name": "<SCRIPT>alert(1)</script>"}')
+    assert script['error_code'] == 'MALICIOUS_CONTENT'
+    assert script['error'].endswith(': <script')
+
+    sql = validate_qr_data("ST001' OR 1=1")
+    assert sql['error_code'] == 'SQL_INJECTION'
+    assert sql['error'].endswith(": ' or 1=1")
+
+    assert validate_qr_data('ID: <Embed src=x>')['error'].endswith(': <embed')
+    assert validate_qr_data('ST001\ud800')['error_code'] == 'BINARY_DATA'
+
+    assert validate_qr_data('ST-2023_001')['data'] == {
+        'type': 'legacy_student_no', 'student_no': 'ST-2023_001', 'legacy': True
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('count', [2, 9])
+def test_generate_bulk_qr_codes_writes_one_file_per_student(tmp_path, monkeypatch, count):
+    from app.utils import qr_utils
+    from app.utils.qr_utils import generate_bulk_qr_codes
+
+    # Send the larger batch through the process pool
+    monkeypatch.setattr(qr_utils, '_BULK_QR_PARALLEL_MIN', 4)
+    monkeypatch.setattr(qr_utils, '_bulk_qr_worker_count', lambda: 2)
+
+    # Payloads are built in this process, so they can be captured here
+    payloads = []
+    create_qr_data = qr_utils.create_qr_data
+
+    def recording_create_qr_data(*args, **kwargs):
+        payloads.append(create_qr_data(*args, **kwargs))
+        return payloads[-1]
+
+    monkeypatch.setattr(qr_utils, 'create_qr_data', recording_create_qr_data)
+
+    students = [{'id': i, 'student_no': f'ST{i:05d}', 'name': f'Student {i}'} for i in range(count)]
+    results = generate_bulk_qr_codes(students, str(tmp_path))
+
+    assert results == {'success': count, 'failed': 0, 'errors': []}
+    assert sorted(os.listdir(tmp_path)) == [f'ST{i:05d}_qr.png' for i in range(count)]
+
+    # Bulk payloads keep the full generated_at timestamp by default
+    assert len(payloads) == count
+    generated_at = json.loads(payloads[0])['generated_at']
+    assert datetime.fromisoformat(generated_at).date() == datetime.utcnow().date()
+    assert 'T' in generated_at
+    if count >= qr_utils._BULK_QR_PARALLEL_MIN:
+        assert qr_utils._bulk_qr_pool is not None
+
+
+@pytest.mark.unit
+def test_stable_qr_codes_reuse_cached_png(tmp_path, monkeypatch):
+    from collections import OrderedDict
+    from app.utils import qr_utils
+    from app.utils.qr_utils import generate_student_qr_code
+
+    monkeypatch.setattr(qr_utils, '_qr_png_cache', OrderedDict())
+    renders = []
+    render = qr_utils._render_qr_png
+    monkeypatch.setattr(qr_utils, '_render_qr_png', lambda qr_data: renders.append(qr_data) or render(qr_data))
+
+    student = {'id': 7, 'student_no': 'ST00007', 'name': 'Cache Test'}
+    first = generate_student_qr_code(student, return_bytes=True, stable=True)
+    path = generate_student_qr_code(student, save_path=str(tmp_path / 'qr.png'), stable=True)
+
+    assert len(renders) == 1
+    with open(path, 'rb') as f:
+        assert f.read() == first
+
+    # Timestamped payloads are unique, so they are rendered every time and never cached
+    generate_student_qr_code(student, return_bytes=True)
+    generate_student_qr_code(student, return_bytes=True)
+    assert len(renders) == 3
+    assert len(qr_utils._qr_png_cache) == 1
+
+
+@pytest.mark.unit
+def test_bulk_qr_codes_check_the_cache_before_the_pool(tmp_path, monkeypatch):
+    from app.utils import qr_utils
+    from app.utils.qr_utils import generate_bulk_qr_codes
+
+    monkeypatch.setattr(qr_utils, '_BULK_QR_PARALLEL_MIN', 4)
+    monkeypatch.setattr(qr_utils, '_bulk_qr_worker_count', lambda: 2)
+    students = [{'id': i, 'student_no': f'BQ{i:05d}', 'name': f'Student {i}'} for i in range(6)]
+
+    first_dir, second_dir = tmp_path / 'first', tmp_path / 'second'
+    assert generate_bulk_qr_codes(students, str(first_dir), stable=True)['success'] == 6
+
+    # Every payload is cached in this process now, so no work reaches the pool
+    def no_pool():
+        raise AssertionError('bulk QR pool used for cached payloads')
+    monkeypatch.setattr(qr_utils, '_get_bulk_qr_pool', no_pool)
+
+    assert generate_bulk_qr_codes(students, str(second_dir), stable=True) == {
+        'success': 6, 'failed': 0, 'errors': []
+    }
+    for name in os.listdir(first_dir):
+        assert (first_dir / name).read_bytes() == (second_dir / name).read_bytes()
+
+
+@pytest.mark.unit
+def test_generated_qr_png_matches_pil_rendering():
+    import io
+    import numpy as np
+    import qrcode
+    from PIL import Image
+    from app.utils.qr_utils import create_qr_data, generate_student_qr_code
+
+    student = {'id': 1, 'student_no': 'ST00001', 'name': 'Matrix Test'}
+    png = Image.open(io.BytesIO(generate_student_qr_code(student, return_bytes=True, stable=True)))
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=10, border=4)
+    qr.add_data(create_qr_data(student, stable=True))
+    qr.make(fit=True)
+    reference = qr.make_image(fill_color="black", back_color="white").convert('L')
+
+    assert png.mode == '1'
+    assert np.array_equal(np.asarray(png.convert('L')), np.asarray(reference))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('student', [
+    {'id': 12, 'student_no': 'ST2023001', 'name': 'Juan Dela Cruz', 'department': 'CS',
+     'section': 'A', 'year_level': 3},
+    {'id': '12', 'student_no': 'ST-01', 'name': 'José "Pepe" Núñez\n', 'section': None,
+     'year_level': '3rd', 'department': True},
+    {},
+])
+def test_student_qr_template_matches_json_encoding(student, monkeypatch):
+    from app.utils import qr_utils
+    from app.utils.qr_utils import create_qr_data
+
+    # Without orjson the payload comes from the string template
+    monkeypatch.setattr(qr_utils, 'orjson', None)
+    monkeypatch.setattr(qr_utils, '_json_dumps',
+                        lambda value: json.dumps(value, separators=(',', ':'), ensure_ascii=False))
+    qr_data = create_qr_data(student, stable=True)
+    generated_at = json.loads(qr_data)['generated_at']
+
+    expected = json.dumps({
+        'type': 'student_attendance',
+        'student_id': student.get('id'),
+        'student_no': student.get('student_no'),
+        'name': student.get('name'),
+        'department': student.get('department'),
+        'section': student.get('section'),
+        'year_level': student.get('year_level'),
+        'generated_at': generated_at,
+        'version': '1.0'
+    }, separators=(',', ':'), ensure_ascii=False)
+
+    assert qr_data == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('content, error_code', [
+    ('ST-2023_001', None),
+    ('S' * 20, None),
+    ('S' * 21, 'LEGACY_TOO_LONG'),
+    ('ST 2023', 'LEGACY_INVALID_CHARS'),
+    ('ST2023.1', 'LEGACY_INVALID_CHARS'),
+    ('ST2023ñ', None),
+    ('_', 'LEGACY_INVALID_CHARS'),
+    ('-', 'LEGACY_INVALID_CHARS'),
+    ('-_', 'LEGACY_INVALID_CHARS'),
+    ('___', 'LEGACY_INVALID_CHARS'),
+])
+def test_validate_qr_data_legacy_student_numbers(content, error_code):
+    from app.utils.qr_utils import validate_qr_data
+
+    result = validate_qr_data(content)
+
+    assert result['valid'] is (error_code is None)
+    assert result['error_code'] == error_code
+
+
+@pytest.mark.unit
+def test_validate_qr_data_student_id_characters():
+    from app.utils.qr_utils import validate_qr_data
+
+    payload = '{"type":"student_attendance","student_id":"%s","student_no":"ST1","name":"A"}'
+
+    assert validate_qr_data(payload % 'ST-01_A')['data']['student_id'] == 'ST-01_A'
+    assert validate_qr_data(payload % '42')['data']['student_id'] == 42
+    assert validate_qr_data(payload % 'Ä12')['data']['student_id'] == 'Ä12'
+    assert validate_qr_data(payload % 'ST 01')['error_code'] == 'INVALID_STUDENT_ID_FORMAT'
+    assert validate_qr_data(payload % '_-_')['error_code'] == 'INVALID_STUDENT_ID_FORMAT'
+
+
+@pytest.mark.unit
+def test_student_id_checks_match_isalnum():
+    from app.utils.qr_utils import validate_qr_data
+
+    payload = '{"type":"student_attendance","student_id":%s,"student_no":"ST1","name":"A"}'
+    samples = ['ST-01', '_', '-_', 'a_', '_a', 'Ä12', 'ñ-1', '١٢٣', '½', 'Ⅳ', 'a b', 'a.b', 'a\n', '_\u0301']
+    for sample in samples:
+        expected = sample.replace('-', '').replace('_', '').isalnum()
+        assert validate_qr_data(payload % json.dumps(sample))['valid'] is expected, sample
+        # Legacy content is stripped before it is checked
+        legacy = sample.strip()
+        assert validate_qr_data(sample)['valid'] is legacy.replace('-', '').replace('_', '').isalnum(), sample
+
+
+@pytest.mark.unit
+def test_process_uploaded_qr_image_decodes_generated_code():
+    import io
+    from werkzeug.datastructures import FileStorage
+    from app.utils.qr_utils import create_qr_data, generate_student_qr_code, process_uploaded_qr_image
+
+    student = {'id': 5, 'student_no': 'ST00005', 'name': 'Upload Test', 'department': 'CS',
+               'section': 'A', 'year_level': 2}
+    png = generate_student_qr_code(student, return_bytes=True, stable=True)
+    upload = FileStorage(stream=io.BytesIO(png), filename='qr.png', content_type='image/png')
+
+    result = process_uploaded_qr_image(upload)
+
+    assert result['success'], result
+    assert result['raw_data'] == create_qr_data(student, stable=True)
+    assert result['data']['student_no'] == 'ST00005'
+    assert result['qr_rect']['width'] > 0 and result['qr_rect']['height'] > 0
+
+
+@pytest.mark.unit
+def test_qr_scanner_status_reports_each_library():
+    import importlib.util
+    from app.utils.qr_utils import get_qr_scanner_status
+
+    status = get_qr_scanner_status()
+    has_cv2 = importlib.util.find_spec('cv2') is not None
+    has_pyzbar = importlib.util.find_spec('pyzbar') is not None
+
+    assert status['opencv_available'] is has_cv2
+    assert status['pyzbar_available'] is has_pyzbar
+    assert status['image_scanning'] is (has_cv2 and has_pyzbar)